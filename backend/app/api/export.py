@@ -0,0 +1,112 @@
+import csv
+import io
+from collections import defaultdict
+
+import orjson
+from sqlalchemy import select
+
+from app.db.models import Response
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_BATCH_SIZE = 1000
+
+# Response fields included with each inquiry, named like the API's response schema
+RESPONSE_EXPORT_COLUMNS = (
+    Response.id, Response.inquiry_id, Response.agent_id,
+    Response.content, Response.is_automated, Response.created_at
+)
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv"
+}
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return getattr(value, "value", value)
+
+class _CsvBuffer:
+    """csv.writer target whose contents are taken after every batch"""
+
+    def __init__(self):
+        self._buffer = io.StringIO()
+        self.writer = csv.writer(self._buffer)
+
+    def take(self):
+        data = self._buffer.getvalue().encode("utf-8")
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+async def _responses_by_inquiry(db, inquiry_ids):
+    """Load the responses of one batch of inquiries, grouped by inquiry"""
+    grouped = defaultdict(list)
+    result = await db.execute(
+        select(*RESPONSE_EXPORT_COLUMNS).filter(
+            Response.inquiry_id.in_(inquiry_ids)
+        ).order_by(Response.inquiry_id, Response.created_at, Response.id)
+    )
+    for row in result:
+        grouped[row.inquiry_id].append(row)
+    return grouped
+
+async def stream_export(session_factory, statement, include_responses=False, format="ndjson"):
+    """
+    Stream the rows of a select() as NDJSON or CSV
+
+    Rows come from a server-side cursor EXPORT_BATCH_SIZE at a time and are
+    encoded and yielded batch by batch, so memory use doesn't grow with the
+    size of the export. With include_responses each inquiry's responses are
+    loaded per batch: nested under "responses" in NDJSON, or as one CSV line
+    per response (a single line with empty response columns if there are none).
+
+    Args:
+        session_factory: Opens the session the export runs in; the request's
+            own session is closed before a streamed body is sent
+        statement: select() of labelled inquiry columns, including Inquiry.id
+        include_responses (bool): Add each inquiry's responses
+        format (str): "ndjson" or "csv"
+
+    Yields:
+        bytes: Encoded lines, one chunk per batch
+    """
+    csv_buffer = None
+    if format == "csv":
+        csv_buffer = _CsvBuffer()
+        header = list(statement.selected_columns.keys())
+        if include_responses:
+            header += [f"response_{column.key}" for column in RESPONSE_EXPORT_COLUMNS]
+        csv_buffer.writer.writerow(header)
+        yield csv_buffer.take()
+
+    async with session_factory() as db:
+        result = await db.stream(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for batch in result.partitions():
+            responses = {}
+            if include_responses:
+                responses = await _responses_by_inquiry(db, [row.id for row in batch])
+
+            if csv_buffer is None:
+                lines = []
+                for row in batch:
+                    record = row._asdict()
+                    if include_responses:
+                        record["responses"] = [response._asdict() for response in responses.get(row.id, ())]
+                    lines.append(orjson.dumps(record, option=orjson.OPT_UTC_Z | orjson.OPT_APPEND_NEWLINE))
+                yield b"".join(lines)
+                continue
+
+            empty = [""] * len(RESPONSE_EXPORT_COLUMNS)
+            for row in batch:
+                values = [_csv_value(value) for value in row]
+                if not include_responses:
+                    csv_buffer.writer.writerow(values)
+                    continue
+                for response in responses.get(row.id) or [None]:
+                    csv_buffer.writer.writerow(
+                        values + ([_csv_value(value) for value in response] if response else empty)
+                    )
+            yield csv_buffer.take()
@@ -0,0 +1,95 @@
+import base64
+import json
+from datetime import datetime
+
+from fastapi import HTTPException, status
+from sqlalchemy import tuple_
+
+# Response header carrying the cursor for the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(created_at, row_id):
+    """Encode a (created_at, id) position as an opaque cursor"""
+    payload = json.dumps([created_at.isoformat() if created_at else None, row_id])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor
+
+    Returns:
+        tuple: (created_at, id) of the last row on the previous page
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+def _page(query, created_column, id_column, limit, cursor, skip, descending):
+    """Restrict a query or select() to one page ordered by (created_at, id)"""
+    position = tuple_(created_column, id_column)
+    if cursor:
+        last = tuple_(*decode_cursor(cursor))
+        query = query.filter(position < last if descending else position > last)
+
+    if descending:
+        query = query.order_by(created_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(created_column.asc(), id_column.asc())
+
+    if skip and not cursor:
+        query = query.offset(skip)
+    return query.limit(limit)
+
+def _next_cursor(rows, created_column, id_column, limit):
+    if rows and len(rows) == limit:
+        return encode_cursor(getattr(rows[-1], created_column.key), getattr(rows[-1], id_column.key))
+    return None
+
+def paginate(query, created_column, id_column, limit, cursor=None, skip=0, descending=False):
+    """
+    Fetch one page of a query ordered by (created_at, id)
+
+    With a cursor, rows are found by seeking past the previous page's last
+    (created_at, id) pair, so every page costs the same however deep it is.
+    Without one, skip is applied as a plain offset for older clients.
+
+    Args:
+        query: The filtered SQLAlchemy query
+        created_column: The created_at column to order by
+        id_column: The primary key column that breaks created_at ties
+        limit (int): Maximum number of rows to return
+        cursor (str): Cursor returned with the previous page, if any
+        skip (int): Rows to skip when no cursor is given
+        descending (bool): Newest rows first
+
+    Returns:
+        tuple: (rows, next_cursor), where next_cursor is None on the last page
+    """
+    rows = _page(query, created_column, id_column, limit, cursor, skip, descending).all()
+    return rows, _next_cursor(rows, created_column, id_column, limit)
+
+async def apaginate(db, statement, created_column, id_column, limit, cursor=None, skip=0, descending=False,
+                    scalars=True):
+    """
+    Async variant of paginate for a select() run on an AsyncSession
+
+    Args:
+        db: Async database session
+        statement: The filtered select() statement
+        scalars (bool): Return the first column of each row (the ORM object
+            for select(Model)); False returns Row tuples of the selected
+            columns, which must include created_column and id_column
+
+    Returns:
+        tuple: (rows, next_cursor), where next_cursor is None on the last page
+    """
+    page = _page(statement, created_column, id_column, limit, cursor, skip, descending)
+    result = await db.execute(page)
+    rows = (result.scalars() if scalars else result).all()
+    return rows, _next_cursor(rows, created_column, id_column, limit)
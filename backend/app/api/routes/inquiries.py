@@ -1,17 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional
+from pydantic import BaseModel, ConfigDict
 from datetime import datetime
 
-from app.db.session import get_db
+from app.core.config import settings
+from app.db.session import get_async_db, AsyncSessionLocal
 from app.db.models import Inquiry, InquiryType, InquiryStatus, User
 from app.llm.classifier import InquiryClassifier
+from app.llm.batching import ClassificationBatcher
+from app.llm.answer_reuse import answer_index
 from app.websocket.server import emit_new_inquiry, emit_inquiry_updated, emit_escalation
+from app.core.auth_cache import UserSnapshot
 from app.core.security import get_current_user, get_current_admin
+from app.api.pagination import NEXT_CURSOR_HEADER, apaginate
+from app.api.serialization import schema_columns, json_rows_response
+from app.api.export import EXPORT_MEDIA_TYPES, stream_export
+from app.tasks.classification import ClassificationWorkerPool, apply_classification
 
 router = APIRouter()
 classifier = InquiryClassifier()
+# Concurrent submissions are merged into packed classification requests
+classification_batcher = ClassificationBatcher(
+    classifier,
+    batch_size=settings.CLASSIFIER_BATCH_SIZE,
+    max_wait=settings.CLASSIFIER_BATCH_MAX_WAIT_MS / 1000
+)
+classification_pool = ClassificationWorkerPool(
+    classification_batcher,
+    workers=settings.CLASSIFICATION_WORKERS
+)
 
 # Pydantic models for request/response validation
 class InquiryBase(BaseModel):
@@ -31,48 +51,74 @@ class InquiryResponse(InquiryBase):
     escalated: bool
     escalation_reason: Optional[str] = None
     
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class InquiryUpdate(BaseModel):
     status: Optional[InquiryStatus] = None
     escalated: Optional[bool] = None
     
-    class Config:
-        use_enum_values = True
+    model_config = ConfigDict(use_enum_values=True)
 
-@router.post("/", response_model=InquiryResponse, status_code=status.HTTP_201_CREATED)
-async def create_inquiry(inquiry: InquiryCreate, db: Session = Depends(get_db)):
-    """Create a new customer inquiry and classify it"""
+@router.post(
+    "/",
+    response_model=InquiryResponse,
+    status_code=status.HTTP_201_CREATED,
+    responses={status.HTTP_202_ACCEPTED: {"model": InquiryResponse}}
+)
+async def create_inquiry(
+    inquiry: InquiryCreate,
+    response: Response,
+    defer: Optional[bool] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Create a new customer inquiry and classify it
+    
+    With deferred classification the inquiry is saved as pending, 202 is
+    returned right away and a background worker classifies it.
+    """
     
     # Verify customer exists if ID provided
     if inquiry.customer_id:
-        customer = db.query(User).filter(User.id == inquiry.customer_id).first()
+        customer = await db.get(User, inquiry.customer_id)
         if not customer:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Customer with ID {inquiry.customer_id} not found"
             )
     
-    # Classify the inquiry using the LLM
-    classification = classifier.classify(inquiry.content)
-    
     # Create new inquiry object
     db_inquiry = Inquiry(
         subject=inquiry.subject,
         content=inquiry.content,
-        customer_id=inquiry.customer_id,
-        inquiry_type=classification["type"],
-        confidence_score=classification["confidence"],
-        escalated=classification["should_escalate"],
-        escalation_reason=classification["escalation_reason"],
-        status=InquiryStatus.ESCALATED if classification["should_escalate"] else InquiryStatus.NEW
+        customer_id=inquiry.customer_id
     )
     
+    if defer is None:
+        defer = settings.DEFERRED_CLASSIFICATION
+    
+    if defer:
+        # Save immediately and let the worker pool classify it
+        db_inquiry.status = InquiryStatus.PENDING_CLASSIFICATION
+        db.add(db_inquiry)
+        await db.commit()
+        await db.refresh(db_inquiry)
+        
+        classification_pool.enqueue(db_inquiry.id)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return db_inquiry
+    
+    # Don't hold a pooled connection while waiting on the LLM; saving checks one out again
+    await db.commit()
+    
+    # Classify the inquiry using the LLM
+    classification = await classification_batcher.aclassify(inquiry.content)
+    apply_classification(db_inquiry, classification)
+    
     # Save to database
     db.add(db_inquiry)
-    db.commit()
-    db.refresh(db_inquiry)
+    await db.commit()
+    await db.refresh(db_inquiry)
 
     if db_inquiry.escalated:
         await emit_escalation(db_inquiry, db_inquiry.escalation_reason)
@@ -81,10 +127,79 @@ async def create_inquiry(inquiry: InquiryCreate, db: Session = Depends(get_db)):
     
     return db_inquiry
 
+@router.get("/classifier/stats", response_model=dict)
+async def get_classifier_stats(current_user: UserSnapshot = Depends(get_current_admin)):
+    """Report how often classification was answered without the LLM"""
+    return classifier.stats()
+
+def filter_inquiries(query, inquiry_status=None, escalated=None, inquiry_type=None,
+                     created_after=None, created_before=None):
+    """
+    Apply the list and export filters to an inquiry select()
+    
+    Raises:
+        HTTPException: 400 for an unknown status or inquiry type
+    """
+    if inquiry_status:
+        try:
+            query = query.filter(Inquiry.status == InquiryStatus(inquiry_status))
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid status value: {inquiry_status}"
+            )
+    
+    if escalated is not None:
+        query = query.filter(Inquiry.escalated == escalated)
+    
+    if inquiry_type:
+        try:
+            query = query.filter(Inquiry.inquiry_type == InquiryType(inquiry_type))
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid inquiry type: {inquiry_type}"
+            )
+    
+    if created_after:
+        query = query.filter(Inquiry.created_at >= created_after)
+    if created_before:
+        query = query.filter(Inquiry.created_at < created_before)
+    return query
+
+@router.get("/export")
+async def export_inquiries(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    include_responses: bool = False,
+    status: Optional[str] = None,
+    escalated: Optional[bool] = None,
+    type: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    current_user: UserSnapshot = Depends(get_current_admin)
+):
+    """
+    Stream every matching inquiry as NDJSON or CSV, oldest first
+    
+    Takes the same filters as listing, without paging. Rows are read from a
+    server-side cursor and written out as they arrive, so an export of any
+    size runs in constant memory.
+    """
+    query = filter_inquiries(
+        select(*schema_columns(InquiryResponse, Inquiry)),
+        status, escalated, type, created_after, created_before
+    ).order_by(Inquiry.id.asc())
+    
+    return StreamingResponse(
+        stream_export(AsyncSessionLocal, query, include_responses, format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="inquiries.{format}"'}
+    )
+
 @router.get("/{inquiry_id}", response_model=InquiryResponse)
-async def get_inquiry(inquiry_id: int, db: Session = Depends(get_db)):
+async def get_inquiry(inquiry_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get a specific inquiry by ID"""
-    inquiry = db.query(Inquiry).filter(Inquiry.id == inquiry_id).first()
+    inquiry = await db.get(Inquiry, inquiry_id)
     if not inquiry:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -97,54 +212,44 @@ async def list_inquiries(
     status: Optional[str] = None, 
     escalated: Optional[bool] = None,
     type: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
     skip: int = 0, 
     limit: int = 100,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """List inquiries with optional filtering"""
-    query = db.query(Inquiry)
+    """
+    List inquiries with optional filtering, newest first
+    
+    Pass the X-Next-Cursor header of the previous page as `cursor` to get
+    the next one; `skip` still works but gets slower the deeper it goes.
+    Only the response fields are selected and encoded straight to JSON.
+    """
+    query = select(*schema_columns(InquiryResponse, Inquiry))
 
     if not current_user.is_admin:
         query = query.filter(Inquiry.customer_id == current_user.id)
-
     
     # Apply filters if provided
-    if status:
-        try:
-            status_enum = InquiryStatus(status)
-            query = query.filter(Inquiry.status == status_enum)
-        except ValueError:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Invalid status value: {status}"
-            )
-    
-    if escalated is not None:
-        query = query.filter(Inquiry.escalated == escalated)
-        
-    if type:
-        try:
-            type_enum = InquiryType(type)
-            query = query.filter(Inquiry.inquiry_type == type_enum)
-        except ValueError:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Invalid inquiry type: {type}"
-            )
+    query = filter_inquiries(query, status, escalated, type, created_after, created_before)
     
     # Apply pagination
-    inquiries = query.order_by(Inquiry.created_at.desc()).offset(skip).limit(limit).all()
-    return inquiries
+    inquiries, next_cursor = await apaginate(
+        db, query, Inquiry.created_at, Inquiry.id, limit,
+        cursor=cursor, skip=skip, descending=True, scalars=False
+    )
+    return json_rows_response(inquiries, {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None)
 
 @router.patch("/{inquiry_id}", response_model=InquiryResponse)
 async def update_inquiry(
     inquiry_id: int, 
     inquiry_update: InquiryUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update an inquiry's status or escalation flag"""
-    db_inquiry = db.query(Inquiry).filter(Inquiry.id == inquiry_id).first()
+    db_inquiry = await db.get(Inquiry, inquiry_id)
     if not db_inquiry:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -156,7 +261,15 @@ async def update_inquiry(
     for key, value in update_data.items():
         setattr(db_inquiry, key, value)
     
-    db.commit()
-    db.refresh(db_inquiry)
+    await db.commit()
+    await db.refresh(db_inquiry)
+    
+    # Keep the answer reuse index in step with resolved inquiries
+    if settings.ANSWER_REUSE_ENABLED and "status" in update_data:
+        if db_inquiry.status in [InquiryStatus.RESOLVED, InquiryStatus.CLOSED]:
+            await answer_index.aadd_resolved(db, db_inquiry)
+        else:
+            answer_index.remove(db_inquiry.id)
+    
     await emit_inquiry_updated(db_inquiry)
     return db_inquiry
\ No newline at end of file
@@ -1,16 +1,30 @@
+import json
+import logging
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from datetime import datetime
 
-from app.db.session import get_db
+from app.db.session import get_async_db, AsyncSessionLocal
 from app.db.models import Response, Inquiry, InquiryStatus, User
 from app.llm.response_generator import ResponseGenerator
-from app.websocket.server import emit_new_response
+from app.llm.history import ConversationHistoryBuilder
+from app.llm.answer_reuse import answer_index
+from app.core.config import settings
+from app.core.auth_cache import UserSnapshot
+from app.core.security import get_current_admin
+from app.websocket.server import emit_new_response, emit_response_chunk
+from app.tasks.scheduler import notify_new_response
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 response_generator = ResponseGenerator()
+history_builder = ConversationHistoryBuilder()
 
 # Pydantic models for request/response validation
 class ResponseBase(BaseModel):
@@ -26,26 +40,57 @@ class ResponseResponse(ResponseBase):
     id: int
     created_at: datetime
     
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+def find_reusable_answer(inquiry, previous_responses):
+    """
+    Return a stored answer to a near-duplicate inquiry, if one can be reused
+    
+    The answer is addressed to this inquiry's customer, so inquiry.customer
+    must be loaded.
+    """
+    # Only first replies are reused; later turns depend on the conversation so far
+    if not settings.ANSWER_REUSE_ENABLED or previous_responses:
+        return None
+    
+    match = answer_index.lookup(inquiry.content, exclude_id=inquiry.id)
+    if not match:
+        return None
+    logger.info(
+        f"Reusing answer from inquiry {match.inquiry_id} for inquiry {inquiry.id} "
+        f"(similarity {match.similarity:.2f})"
+    )
+    return match.for_customer(inquiry.customer)
+
+async def single_chunk(text):
+    """Stream an already complete text as one chunk"""
+    yield text
+
+async def get_inquiry_for_generation(db, inquiry_id):
+    """Load an inquiry with the customer the prompt addresses"""
+    return (await db.execute(
+        select(Inquiry).options(selectinload(Inquiry.customer)).filter(Inquiry.id == inquiry_id)
+    )).scalars().first()
 
 # Background task to update inquiry status after response
-def update_inquiry_status(inquiry_id: int, db: Session):
-    inquiry = db.query(Inquiry).filter(Inquiry.id == inquiry_id).first()
-    if inquiry and inquiry.status == InquiryStatus.NEW:
-        inquiry.status = InquiryStatus.IN_PROGRESS
-        db.commit()
+async def update_inquiry_status(inquiry_id: int):
+    # Runs after the request session is closed, so it opens its own
+    async with AsyncSessionLocal() as db:
+        inquiry = await db.get(Inquiry, inquiry_id)
+        if inquiry and inquiry.status == InquiryStatus.NEW:
+            inquiry.status = InquiryStatus.IN_PROGRESS
+            await db.commit()
 
 @router.post("/", response_model=ResponseResponse, status_code=status.HTTP_201_CREATED)
 async def create_response(
     response: ResponseCreate, 
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new response to an inquiry"""
     
     # Verify inquiry exists
-    inquiry = db.query(Inquiry).filter(Inquiry.id == response.inquiry_id).first()
+    inquiry = await db.get(Inquiry, response.inquiry_id)
     if not inquiry:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -54,7 +99,7 @@ async def create_response(
     
     # Verify agent exists if provided
     if response.agent_id:
-        agent = db.query(User).filter(User.id == response.agent_id).first()
+        agent = await db.get(User, response.agent_id)
         if not agent:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -71,22 +116,23 @@ async def create_response(
     
     # Save to database
     db.add(db_response)
-    db.commit()
-    db.refresh(db_response)
+    await db.commit()
+    await db.refresh(db_response)
+    notify_new_response(db_response.inquiry_id, db_response.created_at)
     
     # Schedule background task to update inquiry status
-    background_tasks.add_task(update_inquiry_status, response.inquiry_id, db)
+    background_tasks.add_task(update_inquiry_status, response.inquiry_id)
 
-    await emit_new_response(db_response, response.inquiry_id)
+    await emit_new_response(db_response, response.inquiry_id, inquiry.customer_id)
     
     return db_response
 
 @router.get("/inquiry/{inquiry_id}", response_model=List[ResponseResponse])
-async def get_responses_for_inquiry(inquiry_id: int, db: Session = Depends(get_db)):
+async def get_responses_for_inquiry(inquiry_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get all responses for a specific inquiry"""
     
     # Verify inquiry exists
-    inquiry = db.query(Inquiry).filter(Inquiry.id == inquiry_id).first()
+    inquiry = await db.get(Inquiry, inquiry_id)
     if not inquiry:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -94,9 +140,9 @@ async def get_responses_for_inquiry(inquiry_id: int, db: Session = Depends(get_d
         )
     
     # Get responses ordered by creation time
-    responses = db.query(Response).filter(
+    responses = (await db.execute(select(Response).filter(
         Response.inquiry_id == inquiry_id
-    ).order_by(Response.created_at.asc()).all()
+    ).order_by(Response.created_at.asc()))).scalars().all()
     
     return responses
 
@@ -104,12 +150,12 @@ async def get_responses_for_inquiry(inquiry_id: int, db: Session = Depends(get_d
 async def generate_response(
     inquiry_id: int,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Generate an AI response for an inquiry"""
     
     # Verify inquiry exists
-    inquiry = db.query(Inquiry).filter(Inquiry.id == inquiry_id).first()
+    inquiry = await get_inquiry_for_generation(db, inquiry_id)
     if not inquiry:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -123,13 +169,18 @@ async def generate_response(
             detail=f"Inquiry ID {inquiry_id} is marked for escalation and requires human response"
         )
     
-    # Get previous responses for context
-    previous_responses = db.query(Response).filter(
-        Response.inquiry_id == inquiry_id
-    ).order_by(Response.created_at.asc()).all()
+    # Get recent responses for context; older ones are folded into the inquiry's summary
+    previous_responses = await history_builder.aprepare(db, inquiry)
     
-    # Generate response using LLM
-    response_text = response_generator.generate_response(inquiry, previous_responses)
+    # Don't hold a pooled connection while waiting on the LLM; saving checks one out again
+    await db.commit()
+    
+    # Serve a near-duplicate's answer if possible, otherwise generate one using the LLM
+    match = find_reusable_answer(inquiry, previous_responses)
+    if match:
+        response_text = match.answer
+    else:
+        response_text = await response_generator.agenerate_response(inquiry, previous_responses)
     
     # Create and save response
     db_response = Response(
@@ -139,12 +190,99 @@ async def generate_response(
     )
     
     db.add(db_response)
-    db.commit()
-    db.refresh(db_response)
+    await db.commit()
+    await db.refresh(db_response)
+    notify_new_response(db_response.inquiry_id, db_response.created_at)
     
     # Schedule background task to update inquiry status
-    background_tasks.add_task(update_inquiry_status, inquiry_id, db)
+    background_tasks.add_task(update_inquiry_status, inquiry_id)
     
-    await emit_new_response(db_response, inquiry_id)
+    await emit_new_response(db_response, inquiry_id, inquiry.customer_id)
+
+    return db_response
+
+def format_sse(event: str, data: str) -> str:
+    """Format a Server-Sent Events message from JSON-encoded data"""
+    return f"event: {event}\ndata: {data}\n\n"
+
+@router.post("/generate/{inquiry_id}/stream")
+async def stream_generated_response(
+    inquiry_id: int,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Generate an AI response for an inquiry and stream it as Server-Sent Events
+    
+    Each chunk is sent as a `token` event and mirrored to the agents room as a
+    `response_chunk` Socket.IO event. Once the stream completes the response
+    is saved and a final `done` event carries the stored response.
+    """
+    
+    # Verify inquiry exists
+    inquiry = await get_inquiry_for_generation(db, inquiry_id)
+    if not inquiry:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Inquiry with ID {inquiry_id} not found"
+        )
+    
+    # Check if inquiry is escalated
+    if inquiry.escalated:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Inquiry ID {inquiry_id} is marked for escalation and requires human response"
+        )
+    
+    # Get recent responses for context; older ones are folded into the inquiry's summary
+    previous_responses = await history_builder.aprepare(db, inquiry)
+    
+    # The request session is closed before streaming starts; end its transaction now
+    await db.commit()
+    
+    # Build the prompt now, while the inquiry is still attached to the request session
+    match = find_reusable_answer(inquiry, previous_responses)
+    if match:
+        token_stream = single_chunk(match.answer)
+    else:
+        token_stream = response_generator.astream_response(inquiry, previous_responses)
+    customer_id = inquiry.customer_id
+    
+    async def event_stream():
+        chunks = []
+        try:
+            async for token in token_stream:
+                await emit_response_chunk(inquiry_id, token, len(chunks))
+                chunks.append(token)
+                yield format_sse("token", json.dumps(token))
+        except Exception as e:
+            logger.error(f"Response stream for inquiry {inquiry_id} failed: {str(e)}")
+            yield format_sse("error", json.dumps({"detail": "Response generation failed"}))
+            return
+        
+        # The request session is gone once streaming starts, so save with a fresh one
+        async with AsyncSessionLocal() as stream_db:
+            db_response = Response(
+                content="".join(chunks).strip(),
+                inquiry_id=inquiry_id,
+                is_automated=True
+            )
+            stream_db.add(db_response)
+            await stream_db.commit()
+            await stream_db.refresh(db_response)
+        notify_new_response(inquiry_id, db_response.created_at)
+        
+        await update_inquiry_status(inquiry_id)
+        await emit_new_response(db_response, inquiry_id, customer_id)
+        
+        yield format_sse("done", ResponseResponse.model_validate(db_response).model_dump_json())
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-    return db_response
\ No newline at end of file
+@router.get("/reuse/stats", response_model=dict)
+async def get_answer_reuse_stats(current_user: UserSnapshot = Depends(get_current_admin)):
+    """Report how often generation was served from previously approved answers"""
+    return answer_index.stats()
@@ -1,16 +1,29 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, ConfigDict, EmailStr
 from datetime import datetime
+import asyncio
 import bcrypt
+from concurrent.futures import ThreadPoolExecutor
 from fastapi.security import OAuth2PasswordRequestForm
+from app.core.config import settings
 from app.core.security import create_access_token, get_current_user
-from app.db.session import get_db
+from app.db.session import get_async_db
 from app.db.models import User
+from app.api.pagination import NEXT_CURSOR_HEADER, apaginate
+from app.api.serialization import schema_columns, json_rows_response
 
 router = APIRouter()
 
+# bcrypt releases the GIL, so hashing on these threads keeps the event loop
+# free and lets concurrent logins use every core
+password_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="bcrypt"
+)
+
 # Pydantic models for request/response validation
 class UserBase(BaseModel):
     email: EmailStr
@@ -25,8 +38,7 @@ class UserResponse(UserBase):
     is_admin: bool
     created_at: datetime
     
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class UserLogin(BaseModel):
     email: EmailStr
@@ -35,7 +47,7 @@ class UserLogin(BaseModel):
 # Password hashing utility functions
 def hash_password(password: str) -> str:
     """Hash a password for storing"""
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed.decode('utf-8')
 
@@ -46,12 +58,30 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         hashed_password.encode('utf-8')
     )
 
+def needs_rehash(hashed_password: str) -> bool:
+    """Check whether a stored hash was made with a different cost than BCRYPT_ROUNDS"""
+    try:
+        # bcrypt hashes look like $2b$<cost>$<salt and hash>
+        return int(hashed_password.split('$')[2]) != settings.BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+async def ahash_password(password: str) -> str:
+    """Hash a password on the password thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, hash_password, password)
+
+async def averify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the password thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, verify_password, plain_password, hashed_password)
+
 @router.post("/", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def create_user(user: UserCreate, db: Session = Depends(get_db)):
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Create a new user (customer or agent)"""
     
     # Check if email already exists
-    existing_user = db.query(User).filter(User.email == user.email).first()
+    existing_user = (await db.execute(select(User).filter(User.email == user.email))).scalars().first()
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -59,7 +89,7 @@ async def create_user(user: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Hash the password
-    hashed_password = hash_password(user.password)
+    hashed_password = await ahash_password(user.password)
     
     # Create new user
     db_user = User(
@@ -71,15 +101,15 @@ async def create_user(user: UserCreate, db: Session = Depends(get_db)):
     
     # Save to database
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     return db_user
 
 @router.get("/{user_id}", response_model=UserResponse)
-async def get_user(user_id: int, db: Session = Depends(get_db)):
+async def get_user(user_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get a specific user by ID"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -92,23 +122,33 @@ async def list_users(
     is_admin: Optional[bool] = None,
     skip: int = 0, 
     limit: int = 100,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """List users with optional filtering"""
-    query = db.query(User)
+    """
+    List users with optional filtering, oldest first
+    
+    Pass the X-Next-Cursor header of the previous page as `cursor` to get
+    the next one; `skip` still works but gets slower the deeper it goes.
+    Only the response fields are selected and encoded straight to JSON.
+    """
+    query = select(*schema_columns(UserResponse, User))
     
     # Apply filters if provided
     if is_admin is not None:
         query = query.filter(User.is_admin == is_admin)
     
     # Apply pagination
-    users = query.offset(skip).limit(limit).all()
-    return users
+    users, next_cursor = await apaginate(
+        db, query, User.created_at, User.id, limit,
+        cursor=cursor, skip=skip, scalars=False
+    )
+    return json_rows_response(users, {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None)
 
 @router.post("/login", response_model=dict)
-async def login_user(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login_user(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     """Authenticate a user and return access token"""
-    user = db.query(User).filter(User.email == form_data.username).first()
+    user = (await db.execute(select(User).filter(User.email == form_data.username))).scalars().first()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -116,12 +156,17 @@ async def login_user(form_data: OAuth2PasswordRequestForm = Depends(), db: Sessi
         )
     
     # Verify password
-    if not verify_password(form_data.password, user.hashed_password):
+    if not await averify_password(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials"
         )
     
+    # Upgrade the stored hash now that we have the plain password
+    if needs_rehash(user.hashed_password):
+        user.hashed_password = await ahash_password(form_data.password)
+        await db.commit()
+    
     # Create JWT token
     access_token = create_access_token(
         data={"sub": str(user.id)}
@@ -0,0 +1,129 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class UserSnapshot:
+    """
+    Read-only copy of the user fields authorization needs.
+
+    Unlike a User ORM object it isn't bound to a session, so one instance
+    can be shared by every request made with the same token.
+    """
+
+    __slots__ = ("id", "email", "name", "is_admin")
+
+    def __init__(self, id, email, name, is_admin):
+        self.id = id
+        self.email = email
+        self.name = name
+        self.is_admin = bool(is_admin)
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.email, user.name, user.is_admin)
+
+
+class AuthCache:
+    """
+    LRU caches for verified tokens and the users they belong to.
+
+    Tokens map to a user ID until the token's own expiry; user snapshots
+    live for ttl_seconds and are dropped as soon as the user is modified.
+    A max_size of 0 disables caching.
+    """
+
+    def __init__(self, max_size=1024, ttl_seconds=60):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._tokens = OrderedDict()
+        self._users = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, entries, key):
+        entry = entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if time.time() >= expires_at:
+            del entries[key]
+            return None
+        entries.move_to_end(key)
+        return value
+
+    def _put(self, entries, key, value, expires_at):
+        entries[key] = (expires_at, value)
+        entries.move_to_end(key)
+        while len(entries) > self.max_size:
+            entries.popitem(last=False)
+
+    def get_token(self, token):
+        """Return the user ID of a previously verified token, or None"""
+        with self._lock:
+            return self._get(self._tokens, token)
+
+    def set_token(self, token, user_id, expires_at=None):
+        """Remember a verified token until it expires (epoch seconds)"""
+        if not self.max_size:
+            return
+        with self._lock:
+            self._put(self._tokens, token, user_id, expires_at or time.time() + self.ttl_seconds)
+
+    def generation(self):
+        """Counter bumped by every invalidation; pass it back to set_user"""
+        with self._lock:
+            return self._generation
+
+    def get_user(self, user_id):
+        """Return the cached UserSnapshot for a user ID, or None"""
+        with self._lock:
+            user = self._get(self._users, user_id)
+            if user is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return user
+
+    def set_user(self, user, generation):
+        """
+        Cache a user snapshot loaded from the database
+
+        Args:
+            user (UserSnapshot): The snapshot to cache
+            generation (int): generation() from before the user was loaded;
+                the snapshot is dropped if an invalidation happened since
+        """
+        if not self.max_size:
+            return
+        with self._lock:
+            if generation == self._generation:
+                self._put(self._users, user.id, user, time.time() + self.ttl_seconds)
+
+    def invalidate_user(self, user_id):
+        """Forget a user so the next request reloads it"""
+        with self._lock:
+            self._generation += 1
+            self._users.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._tokens.clear()
+            self._users.clear()
+
+    def stats(self):
+        """Return cache sizes and hit rate for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "tokens": len(self._tokens),
+                "users": len(self._users),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
@@ -13,10 +13,23 @@ class Settings(BaseSettings):
     
     # Database settings
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./app.db")
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # Seconds; -1 never recycles
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    SQLITE_PERFORMANCE_PROFILE: bool = os.getenv("SQLITE_PERFORMANCE_PROFILE", "false").lower() == "true"
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_MMAP_SIZE: int = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    SQLITE_CACHE_SIZE_KB: int = int(os.getenv("SQLITE_CACHE_SIZE_KB", str(64 * 1024)))
 
     # Authentication settings
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 1 week
+    AUTH_CACHE_SIZE: int = int(os.getenv("AUTH_CACHE_SIZE", "1024"))
+    AUTH_CACHE_TTL: int = int(os.getenv("AUTH_CACHE_TTL", "60"))
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
     
     # LLM settings
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
@@ -25,6 +38,44 @@ class Settings(BaseSettings):
     # Application settings
     ESCALATION_THRESHOLD: float = float(os.getenv("ESCALATION_THRESHOLD", "0.7"))
     FOLLOWUP_DAYS: int = int(os.getenv("FOLLOWUP_DAYS", "3"))
+    FOLLOWUP_CONCURRENCY: int = int(os.getenv("FOLLOWUP_CONCURRENCY", "8"))
+    FOLLOWUP_COMMIT_BATCH_SIZE: int = int(os.getenv("FOLLOWUP_COMMIT_BATCH_SIZE", "50"))
+    FOLLOWUP_DISPATCH_CHUNK_SIZE: int = int(os.getenv("FOLLOWUP_DISPATCH_CHUNK_SIZE", "200"))
+    FOLLOWUP_RETRY_MINUTES: int = int(os.getenv("FOLLOWUP_RETRY_MINUTES", "15"))
+    SCHEDULER_RESYNC_MINUTES: int = int(os.getenv("SCHEDULER_RESYNC_MINUTES", "60"))
+    SCHEDULER_LEASE_SECONDS: int = int(os.getenv("SCHEDULER_LEASE_SECONDS", "60"))
+    
+    # Classification cache settings (size 0 disables the cache)
+    CLASSIFIER_CACHE_SIZE: int = int(os.getenv("CLASSIFIER_CACHE_SIZE", "1024"))
+    CLASSIFIER_CACHE_TTL: int = int(os.getenv("CLASSIFIER_CACHE_TTL", str(60 * 60 * 24)))
+    CLASSIFIER_CACHE_PATH: str = os.getenv("CLASSIFIER_CACHE_PATH", "")
+    
+    # Keyword cascade settings (inquiries below the confidence go to the LLM)
+    CASCADE_ENABLED: bool = os.getenv("CASCADE_ENABLED", "true").lower() == "true"
+    CASCADE_MIN_CONFIDENCE: float = float(os.getenv("CASCADE_MIN_CONFIDENCE", "0.85"))
+    
+    # Recent turns kept verbatim in prompts; older ones are folded into the inquiry's summary
+    CONVERSATION_MEMORY_MAX_TURNS: int = int(os.getenv("CONVERSATION_MEMORY_MAX_TURNS", "20"))
+    CONVERSATION_MEMORY_MAX_TOKENS: int = int(os.getenv("CONVERSATION_MEMORY_MAX_TOKENS", "2000"))
+    
+    # Answer reuse settings (similarity is estimated Jaccard over word shingles)
+    ANSWER_REUSE_ENABLED: bool = os.getenv("ANSWER_REUSE_ENABLED", "true").lower() == "true"
+    ANSWER_REUSE_THRESHOLD: float = float(os.getenv("ANSWER_REUSE_THRESHOLD", "0.8"))
+    ANSWER_REUSE_RELOAD_MINUTES: float = float(os.getenv("ANSWER_REUSE_RELOAD_MINUTES", "5"))
+    
+    # Packed classification settings (batch size 1 disables packing)
+    CLASSIFIER_BATCH_SIZE: int = int(os.getenv("CLASSIFIER_BATCH_SIZE", "8"))
+    CLASSIFIER_BATCH_MAX_WAIT_MS: int = int(os.getenv("CLASSIFIER_BATCH_MAX_WAIT_MS", "50"))
+    
+    # Deferred classification settings
+    DEFERRED_CLASSIFICATION: bool = os.getenv("DEFERRED_CLASSIFICATION", "false").lower() == "true"
+    CLASSIFICATION_WORKERS: int = int(os.getenv("CLASSIFICATION_WORKERS", "4"))
+    
+    # Socket.IO fan-out between workers ("memory", "unix", "redis" or "aiopika")
+    SOCKETIO_MANAGER: str = os.getenv("SOCKETIO_MANAGER", "memory")
+    SOCKETIO_MESSAGE_QUEUE: str = os.getenv("SOCKETIO_MESSAGE_QUEUE", "")
+    SOCKETIO_CHANNEL: str = os.getenv("SOCKETIO_CHANNEL", "socketio")
+    SOCKETIO_UNIX_DIR: str = os.getenv("SOCKETIO_UNIX_DIR", "/tmp/support-socketio")
     
     # Use computed_field for Pydantic v2 compatibility
     origins_raw: str = Field(
@@ -2,14 +2,25 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
+from sqlalchemy import event
 from app.core.config import settings
-from app.db.session import get_db
-from sqlalchemy.orm import Session
+from app.core.auth_cache import AuthCache, UserSnapshot
+from app.db.session import get_async_db
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.models import User
 
 # OAuth2 scheme for token authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/users/login")
 
+# Verified tokens and user snapshots, so authenticated requests skip the JWT decode and user query
+auth_cache = AuthCache(max_size=settings.AUTH_CACHE_SIZE, ttl_seconds=settings.AUTH_CACHE_TTL)
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def invalidate_cached_user(mapper, connection, target):
+    """Drop a user's cached snapshot whenever the row changes"""
+    auth_cache.invalidate_user(target.id)
+
 # JWT token functions
 def create_access_token(data: dict):
     """Create a new JWT access token"""
@@ -21,18 +32,49 @@ def create_access_token(data: dict):
 
 def verify_token(token: str):
     """Verify JWT token and return user ID"""
+    user_id = auth_cache.get_token(token)
+    if user_id is not None:
+        return user_id
+    
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
         user_id = payload.get("sub")
         if user_id is None:
             return None
-        return int(user_id)
+        user_id = int(user_id)
     except JWTError:
         return None
+    
+    # Valid until the token itself expires
+    auth_cache.set_token(token, user_id, payload.get("exp"))
+    return user_id
+
+async def load_user(db, user_id):
+    """
+    Load a user's snapshot, from the auth cache when possible
+    
+    Returns:
+        UserSnapshot: The user, or None if no such user exists
+    """
+    user = auth_cache.get_user(user_id)
+    if user is None:
+        generation = auth_cache.generation()
+        db_user = await db.get(User, user_id)
+        if db_user is None:
+            return None
+        user = UserSnapshot.from_user(db_user)
+        auth_cache.set_user(user, generation)
+    return user
 
 # Authentication dependency
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    """Get the current authenticated user"""
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    """
+    Get the current authenticated user
+    
+    Returns:
+        UserSnapshot: The user's id, email, name and is_admin flag; served from
+        the auth cache when possible, so it is not bound to the request session
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -43,14 +85,14 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     if user_id is None:
         raise credentials_exception
     
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await load_user(db, user_id)
     if user is None:
         raise credentials_exception
     
     return user
 
 # Admin authentication dependency
-async def get_current_admin(current_user: User = Depends(get_current_user)):
+async def get_current_admin(current_user: UserSnapshot = Depends(get_current_user)):
     """Check if the current user is an admin"""
     if not current_user.is_admin:
         raise HTTPException(
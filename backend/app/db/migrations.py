@@ -0,0 +1,107 @@
+import logging
+from sqlalchemy import inspect, text
+
+from app.db.models import User, Inquiry, Response, FollowUp
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Base.metadata.create_all only creates missing tables; it never alters
+# existing ones. Schema changes to existing tables are applied here instead.
+# Every step is idempotent, so a database freshly built by create_all (which
+# already has the latest columns) can run them too.
+
+def add_column_if_missing(conn, table, column, ddl):
+    """Add a column to an existing table unless it is already there"""
+    columns = {col["name"] for col in inspect(conn).get_columns(table)}
+    if column not in columns:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+def create_indexes_if_missing(conn, *tables):
+    """
+    Create the indexes declared on the models for existing tables
+
+    Tables that don't exist yet are skipped (create_all builds them with
+    their indexes), as are indexes over columns the table doesn't have.
+    """
+    inspector = inspect(conn)
+    existing_tables = set(inspector.get_table_names())
+    for table in tables:
+        if table.name not in existing_tables:
+            continue
+        columns = {col["name"] for col in inspector.get_columns(table.name)}
+        for index in table.indexes:
+            if all(col.name in columns for col in index.columns):
+                index.create(conn, checkfirst=True)
+
+def add_conversation_summary(conn):
+    add_column_if_missing(conn, "inquiries", "conversation_summary", "TEXT")
+    add_column_if_missing(conn, "inquiries", "summarized_through_id", "INTEGER")
+
+def add_query_indexes(conn):
+    create_indexes_if_missing(conn, Inquiry.__table__, Response.__table__, FollowUp.__table__)
+
+def add_user_pagination_index(conn):
+    create_indexes_if_missing(conn, User.__table__)
+
+def normalize_sqlite_timestamps(conn):
+    """
+    Give timestamps written by CURRENT_TIMESTAMP the microsecond format
+
+    SQLite stores datetimes as text and compares them as strings, so a
+    'YYYY-MM-DD HH:MM:SS' value sorts before the same instant written as
+    'YYYY-MM-DD HH:MM:SS.000000' by the application, which breaks keyset
+    pagination. Other databases have native timestamp types.
+    """
+    if conn.dialect.name != "sqlite":
+        return
+    inspector = inspect(conn)
+    existing_tables = set(inspector.get_table_names())
+    for table in (User.__table__, Inquiry.__table__, Response.__table__):
+        if table.name not in existing_tables:
+            continue
+        columns = {col["name"] for col in inspector.get_columns(table.name)}
+        for column in ("created_at", "updated_at"):
+            if column not in columns:
+                continue
+            conn.execute(text(
+                f"UPDATE {table.name} SET {column} = {column} || '.000000' WHERE length({column}) = 19"
+            ))
+
+def add_pending_classification_status(conn):
+    """
+    Teach PostgreSQL's native inquirystatus enum the PENDING_CLASSIFICATION value
+
+    SQLAlchemy stores Enum members by name, and create_all never alters an
+    existing type. Other databases store the column as VARCHAR. Adding an
+    enum value inside a transaction needs PostgreSQL 12 or later.
+    """
+    if conn.dialect.name != "postgresql":
+        return
+    conn.execute(text("ALTER TYPE inquirystatus ADD VALUE IF NOT EXISTS 'PENDING_CLASSIFICATION'"))
+
+# Ordered list of (version, description, migration function)
+MIGRATIONS = [
+    (1, "Add rolling conversation summary to inquiries", add_conversation_summary),
+    (2, "Add composite indexes for inquiry, response and follow-up queries", add_query_indexes),
+    (3, "Add created_at index for user pagination", add_user_pagination_index),
+    (4, "Store SQLite timestamps with microseconds", normalize_sqlite_timestamps),
+    (5, "Add PENDING_CLASSIFICATION to the PostgreSQL inquiry status enum", add_pending_classification_status),
+]
+
+def run_migrations(engine):
+    """Apply every migration newer than the recorded schema version"""
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)"
+        ))
+        current = conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+
+    for version, description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.execute(text("INSERT INTO schema_version (version) VALUES (:version)"), {"version": version})
+        logger.info(f"Applied migration {version}: {description}")
@@ -1,11 +1,36 @@
-from sqlalchemy import Column, Integer, String, Float, Text, ForeignKey, DateTime, Boolean, Enum
+from sqlalchemy import Column, Integer, String, Float, Text, ForeignKey, DateTime, Boolean, Enum, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from datetime import datetime, timezone
 import enum
 
 Base = declarative_base()
 
+def utcnow():
+    """
+    Timestamp for created_at and updated_at columns
+
+    Set by the application rather than the database's CURRENT_TIMESTAMP, so
+    every row uses one clock (UTC) and, on SQLite, one text format with
+    microseconds; keyset pagination compares these values as stored.
+    """
+    return datetime.now(timezone.utc)
+
+def naive_utcnow():
+    """Current time as naive UTC, comparable with timestamps read back from the database"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def to_utc_naive(value):
+    """
+    Normalize a datetime to naive UTC, the form timestamps are read back in
+
+    Lets values fresh from utcnow() be compared with ones loaded from the
+    database.
+    """
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
 class InquiryType(str, enum.Enum):
     TECHNICAL = "technical"
     BILLING = "billing"
@@ -15,6 +40,7 @@ class InquiryType(str, enum.Enum):
     OTHER = "other"
 
 class InquiryStatus(str, enum.Enum):
+    PENDING_CLASSIFICATION = "pending_classification"
     NEW = "new"
     IN_PROGRESS = "in_progress"
     AWAITING_CUSTOMER = "awaiting_customer"
@@ -30,12 +56,17 @@ class User(Base):
     name = Column(String(100))
     hashed_password = Column(String(100))
     is_admin = Column(Boolean, default=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    created_at = Column(DateTime(timezone=True), default=utcnow)
+    updated_at = Column(DateTime(timezone=True), onupdate=utcnow)
     
     # Relationships
     inquiries = relationship("Inquiry", back_populates="customer")
     responses = relationship("Response", back_populates="agent")
+    
+    # list_users pages through users in creation order
+    __table_args__ = (
+        Index("ix_users_created_at", "created_at"),
+    )
 
 class Inquiry(Base):
     __tablename__ = "inquiries"
@@ -49,13 +80,24 @@ class Inquiry(Base):
     status = Column(Enum(InquiryStatus), default=InquiryStatus.NEW)
     escalated = Column(Boolean, default=False)
     escalation_reason = Column(String(200), nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    conversation_summary = Column(Text, nullable=True)  # Rolling summary of older responses
+    summarized_through_id = Column(Integer, nullable=True)  # Last response folded into the summary
+    created_at = Column(DateTime(timezone=True), default=utcnow)
+    updated_at = Column(DateTime(timezone=True), onupdate=utcnow)
     
     # Relationships
     customer = relationship("User", back_populates="inquiries")
     responses = relationship("Response", back_populates="inquiry")
     followups = relationship("FollowUp", back_populates="inquiry")
+    
+    # list_inquiries filters on one of these columns and sorts by newest first
+    __table_args__ = (
+        Index("ix_inquiries_created_at", "created_at"),
+        Index("ix_inquiries_customer_created", "customer_id", "created_at"),
+        Index("ix_inquiries_status_created", "status", "created_at"),
+        Index("ix_inquiries_escalated_created", "escalated", "created_at"),
+        Index("ix_inquiries_type_created", "inquiry_type", "created_at"),
+    )
 
 class Response(Base):
     __tablename__ = "responses"
@@ -65,11 +107,16 @@ class Response(Base):
     agent_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # Null if AI-generated
     content = Column(Text)
     is_automated = Column(Boolean, default=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), default=utcnow)
     
     # Relationships
     inquiry = relationship("Inquiry", back_populates="responses")
     agent = relationship("User", back_populates="responses")
+    
+    # Responses are always read per inquiry in chronological order
+    __table_args__ = (
+        Index("ix_responses_inquiry_created", "inquiry_id", "created_at"),
+    )
 
 class FollowUp(Base):
     __tablename__ = "followups"
@@ -82,4 +129,17 @@ class FollowUp(Base):
     successful = Column(Boolean, nullable=True)  # True if sent, False if failed
     
     # Relationships
-    inquiry = relationship("Inquiry", back_populates="followups")
\ No newline at end of file
+    inquiry = relationship("Inquiry", back_populates="followups")
+    
+    # The scheduler looks for unsent follow-ups that are due, and per inquiry
+    __table_args__ = (
+        Index("ix_followups_sent_scheduled", "sent_at", "scheduled_at"),
+        Index("ix_followups_inquiry_sent", "inquiry_id", "sent_at"),
+    )
+
+class SchedulerLease(Base):
+    __tablename__ = "scheduler_leases"
+    
+    name = Column(String(100), primary_key=True)  # One row per lease, e.g. the follow-up scheduler
+    holder = Column(String(200), nullable=True)  # Process currently holding the lease
+    expires_at = Column(DateTime, nullable=True)  # Naive UTC; the lease is free once this passes
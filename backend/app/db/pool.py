@@ -0,0 +1,91 @@
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+class PoolMetrics:
+    """
+    Connection pool counters for one engine.
+
+    Checkouts, checkins, new connections and invalidations come from pool
+    events; the time spent waiting for a free connection is recorded by the
+    pool class returned from timed_pool.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def attach(self, engine):
+        """Listen to the pool events of a (sync) engine"""
+        def count(name):
+            def listener(*args):
+                with self._lock:
+                    setattr(self, name, getattr(self, name) + 1)
+            return listener
+
+        event.listen(engine, "connect", count("connects"))
+        event.listen(engine, "checkout", count("checkouts"))
+        event.listen(engine, "checkin", count("checkins"))
+        event.listen(engine, "invalidate", count("invalidations"))
+
+    def record_wait(self, seconds, timed_out=False):
+        with self._lock:
+            self.waits += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def stats(self, pool=None):
+        """Return the counters, plus the pool's current occupancy if it has one"""
+        with self._lock:
+            stats = {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": self.total_wait / self.waits * 1000 if self.waits else 0.0,
+                "max_wait_ms": self.max_wait * 1000
+            }
+        if pool is not None and hasattr(pool, "checkedout"):
+            stats.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "overflow": pool.overflow()
+            })
+        return stats
+
+def timed_pool(pool_class, metrics):
+    """
+    Subclass a QueuePool-style pool class to time every connection checkout
+
+    Args:
+        pool_class: QueuePool or AsyncAdaptedQueuePool
+        metrics (PoolMetrics): Where the wait times are recorded
+
+    Returns:
+        type: The instrumented pool class, to pass as create_engine's poolclass
+    """
+    class TimedPool(pool_class):
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except PoolTimeoutError:
+                metrics.record_wait(time.perf_counter() - started, timed_out=True)
+                raise
+            metrics.record_wait(time.perf_counter() - started)
+            return connection
+
+    TimedPool.__name__ = f"Timed{pool_class.__name__}"
+    return TimedPool
@@ -1,22 +1,157 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 from app.core.config import settings
+from app.db.pool import PoolMetrics, timed_pool
+
+def engine_options(url, pool_class, metrics):
+    """
+    Pool options from settings for an engine on the given URL
+
+    In-memory SQLite databases live and die with their single connection,
+    so they keep SQLAlchemy's default pool.
+    """
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return {}
+    return {
+        "poolclass": timed_pool(pool_class, metrics),
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING
+    }
+
+# Pool counters for each engine, reported by /api/db/stats
+pool_metrics = PoolMetrics()
+async_pool_metrics = PoolMetrics()
 
 # Create SQLAlchemy engine
 engine = create_engine(
     settings.DATABASE_URL, 
-    connect_args={"check_same_thread": False} if settings.DATABASE_URL.startswith("sqlite") else {}
+    connect_args={"check_same_thread": False} if settings.DATABASE_URL.startswith("sqlite") else {},
+    **engine_options(settings.DATABASE_URL, QueuePool, pool_metrics)
 )
+pool_metrics.attach(engine)
+
+# Execution option asking for SQLite transactions that support SAVEPOINTs
+SQLITE_SAVEPOINTS = "sqlite_savepoints"
+
+def enable_sqlite_savepoints(engine):
+    """
+    Let SQLAlchemy manage SQLite transactions that need SAVEPOINTs
+
+    pysqlite only starts a transaction before DML statements, so a SAVEPOINT
+    issued earlier opens (and its RELEASE commits) a transaction of its own.
+    For connections with the sqlite_savepoints execution option, pysqlite's
+    handling is disabled and BEGIN is emitted by us, which keeps nested
+    transactions inside the session's transaction.
+
+    Every other connection keeps pysqlite's behaviour: an explicit BEGIN
+    makes even a plain SELECT hold its lock until commit, blocking writers
+    while a request waits on the LLM.
+    """
+    @event.listens_for(engine, "begin")
+    def do_begin(conn):
+        dbapi_connection = conn.connection.dbapi_connection
+        if conn.get_execution_options().get(SQLITE_SAVEPOINTS):
+            if dbapi_connection.isolation_level is not None:
+                dbapi_connection.isolation_level = None
+            conn.exec_driver_sql("BEGIN")
+        elif dbapi_connection.isolation_level is None:
+            # Pooled connection last used for a savepoint transaction
+            dbapi_connection.isolation_level = ""
+
+def apply_sqlite_performance_profile(engine):
+    """
+    Tune every new SQLite connection for concurrent access
+
+    WAL lets readers proceed while a writer commits, NORMAL synchronous
+    skips the fsync on every commit (still safe in WAL mode), and
+    busy_timeout makes writers wait for a lock instead of failing with
+    "database is locked". mmap and a larger page cache cut read syscalls.
+
+    busy_timeout can't help a transaction that reads and then writes after
+    another connection has committed in between; SQLite fails it at once,
+    so such transactions should stay short.
+    """
+    pragmas = [
+        ("journal_mode", "WAL"),
+        ("synchronous", "NORMAL"),
+        ("busy_timeout", settings.SQLITE_BUSY_TIMEOUT_MS),
+        ("mmap_size", settings.SQLITE_MMAP_SIZE),
+        # Negative sizes are in KiB rather than pages
+        ("cache_size", -settings.SQLITE_CACHE_SIZE_KB),
+    ]
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas:
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+def configure_sqlite(engine):
+    enable_sqlite_savepoints(engine)
+    if settings.SQLITE_PERFORMANCE_PROFILE:
+        apply_sqlite_performance_profile(engine)
+
+if settings.DATABASE_URL.startswith("sqlite"):
+    configure_sqlite(engine)
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async drivers for the databases we support
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+}
+
+def async_database_url(url):
+    """Swap the driver of a database URL for its asyncio counterpart"""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend in ASYNC_DRIVERS:
+        url = url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+    return url
+
+# Async engine used by the API routes and background tasks, so queries don't
+# block the event loop. The sync engine above stays for scripts and tests.
+async_engine = create_async_engine(
+    async_database_url(settings.DATABASE_URL),
+    **engine_options(settings.DATABASE_URL, AsyncAdaptedQueuePool, async_pool_metrics)
+)
+async_pool_metrics.attach(async_engine.sync_engine)
+
+if settings.DATABASE_URL.startswith("sqlite"):
+    configure_sqlite(async_engine.sync_engine)
+
+# Objects stay usable after commit; async sessions can't lazily reload them
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Sessions whose transactions support begin_nested() on SQLite too; they share
+# async_engine's pool and are only needed where savepoints are used
+SavepointSessionLocal = async_sessionmaker(
+    async_engine.execution_options(**{SQLITE_SAVEPOINTS: True}),
+    autoflush=False,
+    expire_on_commit=False
+)
+
 # Dependency to get DB session
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Dependency to get an async DB session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
\ No newline at end of file
@@ -0,0 +1,295 @@
+import asyncio
+import hashlib
+import logging
+import re
+import threading
+from collections import defaultdict
+
+import numpy as np
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.db.models import Inquiry, InquiryStatus, Response, User
+from app.llm.cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Prime just above 2**32 for the (a * x + b) mod p permutations
+HASH_PRIME = np.uint64(4294967311)
+
+# Placeholders standing in for the original customer's details in stored answers
+CUSTOMER_NAME_SLOT = "{customer_name}"
+CUSTOMER_EMAIL_SLOT = "{customer_email}"
+
+def depersonalize(answer, name=None, email=None):
+    """
+    Replace a customer's name and email in an answer with placeholders
+
+    The full name is replaced first, then each part of it on its own
+    ("Hi Jane" as well as "Jane Doe"), matched as whole, case-sensitive words.
+    """
+    if email:
+        answer = re.sub(re.escape(email), CUSTOMER_EMAIL_SLOT, answer, flags=re.IGNORECASE)
+    if name:
+        parts = {name.strip(), *name.split()}
+        for part in sorted((part for part in parts if len(part) > 1), key=len, reverse=True):
+            answer = re.sub(rf"\b{re.escape(part)}\b", CUSTOMER_NAME_SLOT, answer)
+    return answer
+
+def personalize(answer, name=None, email=None):
+    """Fill the placeholders left by depersonalize with another customer's details"""
+    answer = answer.replace(CUSTOMER_NAME_SLOT, name or "Valued Customer")
+    return answer.replace(CUSTOMER_EMAIL_SLOT, email or "your email address")
+
+class AnswerMatch:
+    """A previously answered inquiry similar to the one being answered"""
+
+    def __init__(self, inquiry_id, answer, similarity):
+        self.inquiry_id = inquiry_id
+        self.answer = answer
+        self.similarity = similarity
+
+    def for_customer(self, customer):
+        """Return this match with the answer addressed to the given customer (a User or None)"""
+        answer = personalize(
+            self.answer,
+            customer.name if customer else None,
+            customer.email if customer else None
+        )
+        return AnswerMatch(self.inquiry_id, answer, self.similarity)
+
+class AnswerReuseIndex:
+    """
+    MinHash/LSH index over resolved inquiries and their final agent replies.
+
+    Only replies written or sent by an agent (agent_id set) are indexed, so
+    unreviewed LLM output and scheduler follow-ups are never reused. Answers
+    are stored with the customer's name and email replaced by placeholders;
+    see AnswerMatch.for_customer.
+
+    Inquiry texts are reduced to word-shingle MinHash signatures; LSH
+    banding narrows a lookup to candidates sharing at least one band, and
+    the estimated Jaccard similarity decides whether the stored answer is
+    close enough to reuse. Everything runs locally in NumPy.
+    """
+
+    def __init__(self, threshold=0.8, num_perm=64, bands=16, shingle_size=3, seed=7):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.seed = seed
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 2 ** 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 2 ** 32, size=num_perm, dtype=np.uint64)
+
+        self._entries = {}
+        self._buckets = [defaultdict(set) for _ in range(bands)]
+        self._lock = threading.Lock()
+
+        # Counters
+        self.lookups = 0
+        self.hits = 0
+
+    def _shingles(self, text):
+        words = normalize_text(text).split()
+        if len(words) < self.shingle_size:
+            return {" ".join(words)} if words else set()
+        return {
+            " ".join(words[i:i + self.shingle_size])
+            for i in range(len(words) - self.shingle_size + 1)
+        }
+
+    def signature(self, text):
+        """Compute the MinHash signature of a text, or None if it has no words"""
+        shingles = self._shingles(text)
+        if not shingles:
+            return None
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little")
+             for s in shingles),
+            dtype=np.uint64,
+            count=len(shingles)
+        )
+        # One row per permutation, one column per shingle
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % HASH_PRIME
+        return permuted.min(axis=1)
+
+    def _band_keys(self, signature):
+        return [
+            signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+    def add(self, inquiry_id, inquiry_text, answer):
+        """Index (or re-index) an answered inquiry"""
+        signature = self.signature(inquiry_text)
+        if signature is None or not answer:
+            return
+        with self._lock:
+            self._remove(inquiry_id)
+            self._entries[inquiry_id] = (signature, answer)
+            for band, key in enumerate(self._band_keys(signature)):
+                self._buckets[band][key].add(inquiry_id)
+
+    def remove(self, inquiry_id):
+        """Drop an inquiry from the index"""
+        with self._lock:
+            self._remove(inquiry_id)
+
+    def _remove(self, inquiry_id):
+        entry = self._entries.pop(inquiry_id, None)
+        if entry is None:
+            return
+        for band, key in enumerate(self._band_keys(entry[0])):
+            bucket = self._buckets[band].get(key)
+            if bucket is not None:
+                bucket.discard(inquiry_id)
+                if not bucket:
+                    del self._buckets[band][key]
+
+    def lookup(self, inquiry_text, exclude_id=None):
+        """
+        Find the most similar answered inquiry above the threshold
+
+        Args:
+            inquiry_text (str): The text of the inquiry being answered
+            exclude_id: Inquiry ID to ignore (usually the inquiry itself)
+
+        Returns:
+            AnswerMatch: The best match, or None
+        """
+        signature = self.signature(inquiry_text)
+        with self._lock:
+            self.lookups += 1
+            if signature is None:
+                return None
+
+            candidates = set()
+            for band, key in enumerate(self._band_keys(signature)):
+                candidates |= self._buckets[band].get(key, set())
+            candidates.discard(exclude_id)
+
+            best = None
+            for candidate_id in candidates:
+                candidate_signature, answer = self._entries[candidate_id]
+                similarity = float(np.mean(candidate_signature == signature))
+                if similarity >= self.threshold and (best is None or similarity > best.similarity):
+                    best = AnswerMatch(candidate_id, answer, similarity)
+
+            if best is not None:
+                self.hits += 1
+            return best
+
+    def _final_response(self, inquiry):
+        return select(Response.content, User.name, User.email).join(
+            Inquiry, Inquiry.id == Response.inquiry_id
+        ).outerjoin(
+            User, User.id == Inquiry.customer_id
+        ).filter(
+            Response.inquiry_id == inquiry.id,
+            Response.agent_id.isnot(None)
+        ).order_by(Response.id.desc()).limit(1)
+
+    def _add_answer(self, inquiry_id, inquiry_text, answer, customer_name, customer_email):
+        if answer:
+            self.add(inquiry_id, inquiry_text, depersonalize(answer, customer_name, customer_email))
+
+    def add_resolved(self, db, inquiry):
+        """Index a resolved inquiry using its latest agent reply"""
+        row = db.execute(self._final_response(inquiry)).first()
+        if row:
+            self._add_answer(inquiry.id, inquiry.content, *row)
+
+    async def aadd_resolved(self, db, inquiry):
+        """Async variant of add_resolved for an AsyncSession"""
+        row = (await db.execute(self._final_response(inquiry))).first()
+        if row:
+            self._add_answer(inquiry.id, inquiry.content, *row)
+
+    def load(self, db):
+        """Build the index from every resolved or closed inquiry with an agent reply"""
+        latest = db.query(
+            Response.inquiry_id,
+            func.max(Response.id).label("response_id")
+        ).filter(
+            Response.agent_id.isnot(None)
+        ).group_by(Response.inquiry_id).subquery()
+
+        rows = db.query(Inquiry.id, Inquiry.content, Response.content, User.name, User.email).join(
+            latest, latest.c.inquiry_id == Inquiry.id
+        ).join(
+            Response, Response.id == latest.c.response_id
+        ).outerjoin(
+            User, User.id == Inquiry.customer_id
+        ).filter(
+            Inquiry.status.in_([InquiryStatus.RESOLVED, InquiryStatus.CLOSED])
+        ).yield_per(1000)
+
+        for row in rows:
+            self._add_answer(*row)
+        return len(self._entries)
+
+    def rebuild(self, db):
+        """
+        Replace the index with one freshly loaded from the database
+
+        Each worker has its own index and only hears about the resolutions
+        it handles itself; rebuilding picks up those made by other workers
+        and drops inquiries that were reopened. Lookups keep using the old
+        entries until the new ones are swapped in.
+
+        Returns:
+            int: Number of indexed inquiries
+        """
+        fresh = AnswerReuseIndex(
+            self.threshold, self.num_perm, self.bands, self.shingle_size, self.seed
+        )
+        fresh.load(db)
+        with self._lock:
+            self._entries = fresh._entries
+            self._buckets = fresh._buckets
+            return len(self._entries)
+
+    def stats(self):
+        """Return index size and hit rate for monitoring"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": self.hits / self.lookups if self.lookups else 0.0
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+# Shared index used by the response routes and kept current as inquiries are resolved
+answer_index = AnswerReuseIndex(threshold=settings.ANSWER_REUSE_THRESHOLD)
+
+def _rebuild_from(session_factory):
+    db = session_factory()
+    try:
+        return answer_index.rebuild(db)
+    finally:
+        db.close()
+
+async def reload_answer_index(session_factory, interval_seconds):
+    """
+    Rebuild the shared index from the database every interval_seconds
+
+    Args:
+        session_factory: Opens a sync session; the rebuild runs on a thread
+        interval_seconds (float): Time between rebuilds
+    """
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            entries = await asyncio.to_thread(_rebuild_from, session_factory)
+            logger.info(f"Reloaded answer reuse index with {entries} inquiries")
+        except Exception as e:
+            logger.error(f"Failed to reload answer reuse index: {str(e)}")
@@ -0,0 +1,67 @@
+import asyncio
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class ClassificationBatcher:
+    """
+    Micro-batches concurrent classification requests.
+
+    Calls to aclassify are collected until batch_size texts are waiting or
+    max_wait seconds have passed since the first one arrived, then the whole
+    group goes out as a single classify_many request. With a batch size of 1
+    every call goes straight to the classifier.
+    """
+
+    def __init__(self, classifier, batch_size=8, max_wait=0.05):
+        self.classifier = classifier
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self._pending = []
+        self._timer = None
+        # The event loop only keeps weak references to tasks
+        self._tasks = set()
+
+    async def aclassify(self, inquiry_text):
+        """Classify a single inquiry as part of the next packed request"""
+        if self.batch_size <= 1:
+            return await self.classifier.aclassify(inquiry_text)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((inquiry_text, future))
+
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        texts = [text for text, _ in batch]
+        try:
+            results = await self.classifier.aclassify_many(texts)
+        except Exception as e:
+            logger.error(f"Packed classification of {len(batch)} inquiries failed: {str(e)}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,192 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from app.db.models import InquiryType
+
+# Expired disk rows are deleted at startup and at most this often on writes
+PRUNE_INTERVAL_SECONDS = 3600
+
+def normalize_text(text):
+    """Normalize inquiry text so trivially different copies share a cache key"""
+    return " ".join((text or "").lower().split())
+
+
+class ClassificationCache:
+    """
+    Two-tier cache for classification results.
+
+    The first tier is an in-memory LRU with a TTL. The optional second tier
+    is a SQLite table that survives restarts; disk hits are promoted back
+    into memory and expired rows are pruned. aget and aset do the disk I/O
+    on a thread so the event loop isn't blocked.
+    """
+
+    def __init__(self, max_size=1024, ttl_seconds=86400, db_path=None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # The disk tier has its own lock so memory hits never wait on I/O
+        self._disk_lock = threading.Lock()
+        self._conn = None
+        self._next_prune = 0
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+        if db_path:
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS classification_cache ("
+                "key TEXT PRIMARY KEY, result TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_classification_cache_created_at "
+                "ON classification_cache (created_at)"
+            )
+            self._prune(time.time())
+            self._conn.commit()
+
+    @staticmethod
+    def make_key(inquiry_text, *parts):
+        """Build a content-addressed key from the normalized text and versioning parts"""
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(str(part).encode("utf-8"))
+            digest.update(b"\x00")
+        digest.update(normalize_text(inquiry_text).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return a cached classification result or None"""
+        now = time.time()
+        result = self._get_memory(key, now)
+        if result is None:
+            result = self._get_disk(key, now)
+        return result
+
+    async def aget(self, key):
+        """Async variant of get that reads the disk tier on a thread"""
+        now = time.time()
+        result = self._get_memory(key, now)
+        if result is None:
+            if self._conn is None:
+                return self._get_disk(key, now)
+            result = await asyncio.to_thread(self._get_disk, key, now)
+        return result
+
+    def set(self, key, result):
+        """Store a classification result in every tier"""
+        now = time.time()
+        with self._lock:
+            self._store(key, dict(result), now)
+        if self._conn is not None:
+            self._write_disk(key, result, now)
+
+    async def aset(self, key, result):
+        """Async variant of set that writes the disk tier on a thread"""
+        now = time.time()
+        with self._lock:
+            self._store(key, dict(result), now)
+        if self._conn is not None:
+            await asyncio.to_thread(self._write_disk, key, result, now)
+
+    def clear(self):
+        """Drop every cached entry and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.disk_hits = 0
+        if self._conn is not None:
+            with self._disk_lock:
+                self._conn.execute("DELETE FROM classification_cache")
+                self._conn.commit()
+
+    def stats(self):
+        """Return hit/miss counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries)
+            }
+
+    def _get_memory(self, key, now):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            created_at, result = entry
+            if now - created_at < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(result)
+            del self._entries[key]
+            return None
+
+    def _get_disk(self, key, now):
+        """Look a memory miss up on disk, counting the lookup's outcome"""
+        row = None
+        if self._conn is not None:
+            with self._disk_lock:
+                row = self._conn.execute(
+                    "SELECT result, created_at FROM classification_cache WHERE key = ?",
+                    (key,)
+                ).fetchone()
+
+        with self._lock:
+            if row and now - row[1] < self.ttl_seconds:
+                result = self._decode(row[0])
+                self._store(key, result, row[1])
+                self.hits += 1
+                self.disk_hits += 1
+                return dict(result)
+            self.misses += 1
+            return None
+
+    def _write_disk(self, key, result, now):
+        with self._disk_lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO classification_cache (key, result, created_at) "
+                "VALUES (?, ?, ?)",
+                (key, self._encode(result), now)
+            )
+            if now >= self._next_prune:
+                self._prune(now)
+            self._conn.commit()
+
+    def _prune(self, now):
+        """Delete expired disk rows; the caller commits"""
+        self._conn.execute(
+            "DELETE FROM classification_cache WHERE created_at <= ?",
+            (now - self.ttl_seconds,)
+        )
+        self._next_prune = now + PRUNE_INTERVAL_SECONDS
+
+    def _store(self, key, result, created_at):
+        self._entries[key] = (created_at, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    @staticmethod
+    def _encode(result):
+        data = dict(result)
+        data["type"] = data["type"].value
+        return json.dumps(data)
+
+    @staticmethod
+    def _decode(raw):
+        data = json.loads(raw)
+        data["type"] = InquiryType(data["type"])
+        return data
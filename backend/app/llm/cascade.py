@@ -0,0 +1,133 @@
+import re
+import threading
+
+from app.db.models import InquiryType
+
+# Keyword rules for inquiries that are obvious enough to skip the LLM.
+# Each pattern carries the probability that a match alone implies the type;
+# several matches for the same type are combined as independent evidence.
+KEYWORD_RULES = {
+    InquiryType.BILLING: [
+        (r"\brefund(s|ed|ing)?\b", 0.8),
+        (r"\binvoices?\b", 0.75),
+        (r"\bcharged (twice|two times|double)\b", 0.9),
+        (r"\bdouble[- ]charged\b", 0.9),
+        (r"\b(billing|billed)\b", 0.7),
+        (r"\b(payment|subscription|receipt)s?\b", 0.6),
+        (r"\b(credit card|pricing|price plan)\b", 0.6),
+    ],
+    InquiryType.TECHNICAL: [
+        (r"\berror( code| message)?s?\b", 0.7),
+        (r"\bcrash(es|ed|ing)?\b", 0.8),
+        (r"\b(can ?not|can't|unable to) (log ?in|sign ?in)\b", 0.85),
+        (r"\b(log ?in|sign ?in|password reset|reset (my )?password)\b", 0.6),
+        (r"\b(bug|freez(es|ing)|not loading|doesn't load|won't load)\b", 0.7),
+        (r"\b(api|sdk|integration|timeout)\b", 0.5),
+    ],
+    InquiryType.FEATURE_REQUEST: [
+        (r"\bfeature request\b", 0.9),
+        (r"\b(would be (great|nice)|please add|could you add)\b", 0.75),
+    ],
+}
+
+# Signals that call for the LLM's escalation judgment regardless of category
+ESCALATION_PATTERNS = [
+    r"\b(urgent|asap|immediately|emergency)\b",
+    r"\b(lawyer|legal|lawsuit|sue)\b",
+    r"\b(furious|angry|unacceptable|ridiculous|terrible|worst)\b",
+    r"\bcancel (my|our) (account|subscription|contract)\b",
+    r"!{2,}",
+]
+
+class CascadeClassifier:
+    """
+    CPU-only first stage in front of the LLM classifier.
+
+    Scores the inquiry against keyword rules and only answers when the best
+    category is confident enough and clearly ahead of the runner-up;
+    everything else is left for the LLM.
+    """
+
+    def __init__(self, min_confidence=0.85, rules=None, escalation_patterns=None):
+        self.min_confidence = min_confidence
+        self.rules = {
+            inquiry_type: [(re.compile(pattern, re.IGNORECASE), weight) for pattern, weight in patterns]
+            for inquiry_type, patterns in (rules or KEYWORD_RULES).items()
+        }
+        self.escalation_patterns = [
+            re.compile(pattern, re.IGNORECASE)
+            for pattern in (escalation_patterns or ESCALATION_PATTERNS)
+        ]
+        self._lock = threading.Lock()
+
+        # Counters
+        self.short_circuits = 0
+        self.passthroughs = 0
+
+    def predict(self, inquiry_text):
+        """
+        Score an inquiry against the keyword rules
+
+        Args:
+            inquiry_text (str): The customer inquiry text
+
+        Returns:
+            tuple: (InquiryType, confidence) for the best matching category
+        """
+        scores = {}
+        for inquiry_type, patterns in self.rules.items():
+            miss = 1.0
+            for pattern, weight in patterns:
+                if pattern.search(inquiry_text):
+                    miss *= 1.0 - weight
+            scores[inquiry_type] = 1.0 - miss
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        if not ranked or ranked[0][1] == 0.0:
+            return InquiryType.GENERAL, 0.0
+
+        best_type, best_score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        # Competing evidence for another category lowers the confidence
+        return best_type, best_score * (1.0 - runner_up)
+
+    def classify(self, inquiry_text):
+        """
+        Classify an inquiry without the LLM when the rules are confident
+
+        Args:
+            inquiry_text (str): The customer inquiry text
+
+        Returns:
+            dict: Classification result, or None when the LLM should decide
+        """
+        inquiry_type, confidence = self.predict(inquiry_text or "")
+        confident = confidence >= self.min_confidence and not any(
+            pattern.search(inquiry_text or "") for pattern in self.escalation_patterns
+        )
+
+        with self._lock:
+            if confident:
+                self.short_circuits += 1
+            else:
+                self.passthroughs += 1
+
+        if not confident:
+            return None
+
+        return {
+            "type": inquiry_type,
+            "confidence": round(confidence, 4),
+            "should_escalate": False,
+            "escalation_reason": None
+        }
+
+    def stats(self):
+        """Return how often the cascade answered without the LLM"""
+        with self._lock:
+            total = self.short_circuits + self.passthroughs
+            return {
+                "short_circuits": self.short_circuits,
+                "passthroughs": self.passthroughs,
+                "short_circuit_rate": self.short_circuits / total if total else 0.0
+            }
@@ -1,3 +1,6 @@
+import asyncio
+import hashlib
+import re
 from langchain_core.prompts import PromptTemplate
 
 from langchain.chains import LLMChain
@@ -5,6 +8,8 @@ from langchain_openai import ChatOpenAI
 
 from app.core.config import settings
 from app.db.models import InquiryType
+from app.llm.cache import ClassificationCache
+from app.llm.cascade import CascadeClassifier
 # Define classifier prompt template
 classifier_template = """
 You are an AI assistant classifying customer support inquiries for appropriate routing.
@@ -27,6 +32,43 @@ Customer Inquiry: {inquiry}
 Classification Analysis:
 """
 
+# Define batch classifier prompt template (several numbered inquiries per request)
+batch_classifier_template = """
+You are an AI assistant classifying customer support inquiries for appropriate routing.
+For each numbered inquiry below, determine the most appropriate category from the following options:
+- TECHNICAL: Questions about how to use the product, bug reports, or technical difficulties
+- BILLING: Questions about pricing, subscriptions, refunds, or payment issues
+- GENERAL: General questions about the company or product
+- FEATURE_REQUEST: Suggestions for new features or improvements
+- COMPLAINT: Expressions of dissatisfaction with the product or service
+- OTHER: Anything that doesn't fit the above categories
+
+Additionally, analyze whether each inquiry should be escalated to a human agent based on:
+- Complexity (requires specialized knowledge)
+- Urgency (time-sensitive issues)
+- Emotion (customer appears upset or frustrated)
+- Business critical (involves large accounts or potential legal issues)
+
+Answer every inquiry in order, starting each answer with its number in square brackets
+and using exactly this format:
+[1]
+Category: <CATEGORY> (confidence <0-100>%)
+Escalation: should escalate because <reason> OR should not escalate
+
+Customer Inquiries:
+{inquiries}
+
+Classification Analysis:
+"""
+
+# Matches the "[n]" marker that opens each answer in a packed response
+BATCH_ITEM_PATTERN = re.compile(r"^\s*\[(\d+)\]", re.MULTILINE)
+
+# Changing a prompt changes this version, which invalidates cached classifications
+PROMPT_VERSION = hashlib.sha256(
+    (classifier_template + batch_classifier_template).encode("utf-8")
+).hexdigest()[:12]
+
 class InquiryClassifier:
     def __init__(self):
         # Initialize OpenAI LLM
@@ -44,6 +86,75 @@ class InquiryClassifier:
         
         # Create the classification chain
         self.chain = LLMChain(llm=self.llm, prompt=self.prompt)
+        
+        # Create the packed chain used by classify_many
+        self.batch_prompt = PromptTemplate(
+            input_variables=["inquiries"],
+            template=batch_classifier_template
+        )
+        self.batch_chain = LLMChain(llm=self.llm, prompt=self.batch_prompt)
+        self.batch_size = max(1, settings.CLASSIFIER_BATCH_SIZE)
+        
+        # Results are deterministic at temperature 0, so repeated texts can be cached
+        self.cache = None
+        if settings.CLASSIFIER_CACHE_SIZE > 0:
+            self.cache = ClassificationCache(
+                max_size=settings.CLASSIFIER_CACHE_SIZE,
+                ttl_seconds=settings.CLASSIFIER_CACHE_TTL,
+                db_path=settings.CLASSIFIER_CACHE_PATH or None
+            )
+        
+        # Keyword rules answer the obvious inquiries without calling the LLM
+        self.cascade = None
+        if settings.CASCADE_ENABLED:
+            # Never short-circuit below the escalation threshold, or low-confidence
+            # results would skip the escalation the LLM path applies
+            self.cascade = CascadeClassifier(
+                min_confidence=max(settings.CASCADE_MIN_CONFIDENCE, settings.ESCALATION_THRESHOLD)
+            )
+    
+    def _cache_key(self, inquiry_text):
+        """Key a classification on the text, model, prompt and escalation threshold"""
+        return ClassificationCache.make_key(
+            inquiry_text,
+            settings.LLM_MODEL,
+            PROMPT_VERSION,
+            settings.ESCALATION_THRESHOLD
+        )
+    
+    def _resolve_locally(self, inquiry_text):
+        """Return a classification that doesn't need the LLM (cascade or cache), if any"""
+        if self.cascade is not None:
+            result = self.cascade.classify(inquiry_text)
+            if result is not None:
+                return result
+        
+        if self.cache is None:
+            return None
+        return self.cache.get(self._cache_key(inquiry_text))
+    
+    async def _aresolve_locally(self, inquiry_text):
+        """Async variant of _resolve_locally that reads the disk cache on a thread"""
+        if self.cascade is not None:
+            result = self.cascade.classify(inquiry_text)
+            if result is not None:
+                return result
+        
+        if self.cache is None:
+            return None
+        return await self.cache.aget(self._cache_key(inquiry_text))
+    
+    def _remember(self, inquiry_text, result):
+        """Store a fresh classification in the cache"""
+        if self.cache is not None:
+            self.cache.set(self._cache_key(inquiry_text), result)
+        return result
+    
+    async def _aremember(self, inquiry_text, result):
+        """Async variant of _remember that writes the disk cache on a thread"""
+        if self.cache is not None:
+            await self.cache.aset(self._cache_key(inquiry_text), result)
+        return result
     
     def classify(self, inquiry_text):
         """
@@ -55,9 +166,155 @@ class InquiryClassifier:
         Returns:
             dict: Classification result with type, confidence, escalation info
         """
+        cached = self._resolve_locally(inquiry_text)
+        if cached is not None:
+            return cached
+        
         # Get raw classification output
         raw_output = self.chain.run(inquiry=inquiry_text)
+        return self._remember(inquiry_text, self._parse_output(raw_output))
+    
+    async def aclassify(self, inquiry_text):
+        """
+        Async variant of classify that doesn't block the event loop
+        
+        Args:
+            inquiry_text (str): The customer inquiry text
+            
+        Returns:
+            dict: Classification result with type, confidence, escalation info
+        """
+        cached = await self._aresolve_locally(inquiry_text)
+        if cached is not None:
+            return cached
+        
+        raw_output = await self.chain.arun(inquiry=inquiry_text)
+        return await self._aremember(inquiry_text, self._parse_output(raw_output))
+    
+    def classify_many(self, inquiry_texts):
+        """
+        Classify several inquiries, packing up to batch_size of them into each LLM request
+        
+        Args:
+            inquiry_texts (list[str]): The customer inquiry texts
+            
+        Returns:
+            list[dict]: One classification result per text, in order
+        """
+        results, pending = self._split_resolved(inquiry_texts)
+        
+        for chunk in self._chunks(pending):
+            if len(chunk) == 1:
+                parsed = {}
+            else:
+                raw_output = self.batch_chain.run(inquiries=self._format_batch(inquiry_texts, chunk))
+                parsed = self._parse_batch_output(raw_output, len(chunk))
+            
+            for position, index in enumerate(chunk):
+                if position in parsed:
+                    results[index] = self._remember(inquiry_texts[index], parsed[position])
+                else:
+                    # Fall back to a single-inquiry call for anything the packed output missed
+                    results[index] = self.classify(inquiry_texts[index])
+        
+        return results
+    
+    async def aclassify_many(self, inquiry_texts):
+        """
+        Async variant of classify_many that doesn't block the event loop
+        
+        Args:
+            inquiry_texts (list[str]): The customer inquiry texts
+            
+        Returns:
+            list[dict]: One classification result per text, in order
+        """
+        results, pending = await self._asplit_resolved(inquiry_texts)
+        
+        for chunk in self._chunks(pending):
+            if len(chunk) == 1:
+                parsed = {}
+            else:
+                raw_output = await self.batch_chain.arun(inquiries=self._format_batch(inquiry_texts, chunk))
+                parsed = self._parse_batch_output(raw_output, len(chunk))
+            
+            missing = [index for position, index in enumerate(chunk) if position not in parsed]
+            for position, index in enumerate(chunk):
+                if position in parsed:
+                    results[index] = await self._aremember(inquiry_texts[index], parsed[position])
+            
+            # Fall back to single-inquiry calls for anything the packed output missed
+            fallbacks = await asyncio.gather(*(self.aclassify(inquiry_texts[i]) for i in missing))
+            for index, result in zip(missing, fallbacks):
+                results[index] = result
         
+        return results
+    
+    def stats(self):
+        """Return cascade and cache counters for monitoring"""
+        return {
+            "cascade": self.cascade.stats() if self.cascade is not None else None,
+            "cache": self.cache.stats() if self.cache is not None else None
+        }
+    
+    def _split_resolved(self, inquiry_texts):
+        """Resolve cascade and cache hits and return the indexes that still need the LLM"""
+        results = [None] * len(inquiry_texts)
+        pending = []
+        for index, text in enumerate(inquiry_texts):
+            cached = self._resolve_locally(text)
+            if cached is not None:
+                results[index] = cached
+            else:
+                pending.append(index)
+        return results, pending
+    
+    async def _asplit_resolved(self, inquiry_texts):
+        """Async variant of _split_resolved that reads the disk cache on a thread"""
+        results = [None] * len(inquiry_texts)
+        pending = []
+        for index, text in enumerate(inquiry_texts):
+            cached = await self._aresolve_locally(text)
+            if cached is not None:
+                results[index] = cached
+            else:
+                pending.append(index)
+        return results, pending
+    
+    def _chunks(self, indexes):
+        for start in range(0, len(indexes), self.batch_size):
+            yield indexes[start:start + self.batch_size]
+    
+    def _format_batch(self, inquiry_texts, chunk):
+        """Number the inquiries of a chunk for the packed prompt"""
+        return "\n\n".join(
+            f"[{position + 1}] {inquiry_texts[index].strip()}"
+            for position, index in enumerate(chunk)
+        )
+    
+    def _parse_batch_output(self, raw_output, count):
+        """
+        Split a packed response into per-inquiry results
+        
+        Returns:
+            dict: Classification results keyed by zero-based position; positions
+            that can't be found in the output are left out
+        """
+        markers = list(BATCH_ITEM_PATTERN.finditer(raw_output))
+        parsed = {}
+        for i, marker in enumerate(markers):
+            position = int(marker.group(1)) - 1
+            if position < 0 or position >= count or position in parsed:
+                continue
+            end = markers[i + 1].start() if i + 1 < len(markers) else len(raw_output)
+            block = raw_output[marker.end():end]
+            if "Category:" not in block:
+                continue
+            parsed[position] = self._parse_output(block)
+        return parsed
+    
+    def _parse_output(self, raw_output):
+        """Parse the raw LLM output into a classification result"""
         # Parse classification results
         # In a production system, you would implement more robust parsing
         # This is a simplified example
@@ -1,11 +1,11 @@
-from datetime import datetime, timedelta
+from datetime import timedelta
 from langchain_core.prompts import PromptTemplate
 
 from langchain.chains import LLMChain
 from langchain_openai import ChatOpenAI
 
 from app.core.config import settings
-from app.db.models import InquiryStatus
+from app.db.models import InquiryStatus, naive_utcnow, to_utc_naive
 
 # Define follow-up template
 followup_template = """
@@ -66,31 +66,41 @@ class FollowUpGenerator:
         Returns:
             bool: True if follow-up should be generated
         """
-        # Don't follow up on resolved or closed inquiries
-        if inquiry.status in [InquiryStatus.RESOLVED, InquiryStatus.CLOSED]:
-            return False
-        
         # Don't follow up if there are no responses yet
         if not responses:
             return False
-            
-        # Check if we've waited long enough since the last response
-        last_response_date = max(r.created_at for r in responses)
-        days_since_response = (datetime.now() - last_response_date).days
         
-        return days_since_response >= settings.FOLLOWUP_DAYS
+        return self.should_generate_followup_since(
+            inquiry,
+            max(r.created_at for r in responses)
+        )
     
-    def generate_followup(self, inquiry, responses):
+    def should_generate_followup_since(self, inquiry, last_response_at):
         """
-        Generate a follow-up message for the customer
+        Fast path of should_generate_followup for a precomputed timestamp
         
         Args:
             inquiry: The Inquiry object
-            responses: List of Response objects for this inquiry
+            last_response_at: When the latest response was created, or None
             
         Returns:
-            dict: Follow-up details including text and scheduled time
+            bool: True if follow-up should be generated
         """
+        # Don't follow up on resolved or closed inquiries
+        if inquiry.status in [InquiryStatus.RESOLVED, InquiryStatus.CLOSED]:
+            return False
+        
+        # Don't follow up if there are no responses yet
+        if last_response_at is None:
+            return False
+        
+        # Check if we've waited long enough since the last response
+        days_since_response = (naive_utcnow() - to_utc_naive(last_response_at)).days
+        
+        return days_since_response >= settings.FOLLOWUP_DAYS
+    
+    def _build_inputs(self, inquiry, responses):
+        """Build the prompt inputs for a follow-up"""
         # Get customer name
         customer_name = inquiry.customer.name if inquiry.customer else "Valued Customer"
         
@@ -100,23 +110,55 @@ class FollowUpGenerator:
         
         # Calculate days since last interaction
         last_response_date = responses[-1].created_at
-        days_since_interaction = (datetime.now() - last_response_date).days
-        
-        # Generate the follow-up message
-        followup_text = self.chain.run(
-            customer_name=customer_name,
-            inquiry_type=inquiry.inquiry_type.value if inquiry.inquiry_type else "general",
-            current_status=inquiry.status.value,
-            days_since_interaction=days_since_interaction,
-            original_inquiry=original_inquiry,
-            last_response=last_response
-        )
+        days_since_interaction = (naive_utcnow() - to_utc_naive(last_response_date)).days
         
+        return {
+            "customer_name": customer_name,
+            "inquiry_type": inquiry.inquiry_type.value if inquiry.inquiry_type else "general",
+            "current_status": inquiry.status.value,
+            "days_since_interaction": days_since_interaction,
+            "original_inquiry": original_inquiry,
+            "last_response": last_response
+        }
+    
+    def _build_followup(self, inquiry, followup_text):
+        """Package the generated text into a follow-up record"""
         # Calculate the scheduled time (usually now + a small buffer)
-        scheduled_time = datetime.now() + timedelta(minutes=30)
+        scheduled_time = naive_utcnow() + timedelta(minutes=30)
         
         return {
             "content": followup_text.strip(),
             "scheduled_at": scheduled_time,
             "inquiry_id": inquiry.id
-        }
\ No newline at end of file
+        }
+    
+    def generate_followup(self, inquiry, responses):
+        """
+        Generate a follow-up message for the customer
+        
+        Args:
+            inquiry: The Inquiry object
+            responses: List of Response objects for this inquiry
+            
+        Returns:
+            dict: Follow-up details including text and scheduled time
+        """
+        # Generate the follow-up message
+        followup_text = self.chain.run(**self._build_inputs(inquiry, responses))
+        
+        return self._build_followup(inquiry, followup_text)
+    
+    async def agenerate_followup(self, inquiry, responses):
+        """
+        Async variant of generate_followup that doesn't block the event loop
+        
+        Args:
+            inquiry: The Inquiry object
+            responses: List of Response objects for this inquiry
+            
+        Returns:
+            dict: Follow-up details including text and scheduled time
+        """
+        followup_text = await self.chain.arun(**self._build_inputs(inquiry, responses))
+        
+        return self._build_followup(inquiry, followup_text)
@@ -0,0 +1,149 @@
+import logging
+from langchain_core.prompts import PromptTemplate
+
+from langchain.chains import LLMChain
+from langchain_openai import ChatOpenAI
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+
+from app.core.config import settings
+from app.db.models import Response
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Define the summary template
+summary_template = """
+You maintain a running summary of a customer support conversation so that later replies have context without the full transcript.
+
+Current summary:
+{summary}
+
+New conversation turns to fold into the summary:
+{new_turns}
+
+Write an updated summary in a few sentences. Keep facts, commitments made to the customer, and open questions; drop pleasantries.
+
+Updated summary:
+"""
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token for English text)"""
+    return len(text) // 4 + 1
+
+def speaker_label(resp):
+    """Label a Response for the conversation history"""
+    return "Customer Support" if resp.is_automated else f"Agent ({resp.agent.name})"
+
+def format_turn(resp):
+    return f"{speaker_label(resp)}: {resp.content}"
+
+class ConversationHistoryBuilder:
+    """
+    Builds a constant-size conversation history for response generation.
+
+    The most recent turns (at most max_turns, within max_tokens) are kept
+    verbatim. Older turns are folded into a rolling summary stored on the
+    inquiry, and only responses newer than that summary are ever loaded.
+    """
+
+    def __init__(self, max_turns=None, max_tokens=None):
+        self.max_turns = max_turns or settings.CONVERSATION_MEMORY_MAX_TURNS
+        self.max_tokens = max_tokens or settings.CONVERSATION_MEMORY_MAX_TOKENS
+
+        # Summaries should be stable, so no sampling temperature
+        self.llm = ChatOpenAI(
+            temperature=0,
+            model_name=settings.LLM_MODEL,
+            openai_api_key=settings.OPENAI_API_KEY
+        )
+        self.prompt = PromptTemplate(
+            input_variables=["summary", "new_turns"],
+            template=summary_template
+        )
+        self.chain = LLMChain(llm=self.llm, prompt=self.prompt)
+
+    def _unsummarized(self, inquiry):
+        """Select the responses newer than the stored summary, with their agents"""
+        return select(Response).options(
+            joinedload(Response.agent)
+        ).filter(
+            Response.inquiry_id == inquiry.id,
+            Response.id > (inquiry.summarized_through_id or 0)
+        ).order_by(Response.created_at.asc(), Response.id.asc())
+
+    def _split(self, responses):
+        """Split responses into (aged, recent) by the turn and token budgets"""
+        kept = 0
+        tokens = 0
+        for resp in reversed(responses):
+            cost = estimate_tokens(format_turn(resp))
+            # Always keep the latest turn
+            if kept and (kept >= self.max_turns or tokens + cost > self.max_tokens):
+                break
+            kept += 1
+            tokens += cost
+        split_at = len(responses) - kept
+        return responses[:split_at], responses[split_at:]
+
+    def _summary_inputs(self, inquiry, aged):
+        return {
+            "summary": inquiry.conversation_summary or "(none yet)",
+            "new_turns": "\n\n".join(format_turn(resp) for resp in aged)
+        }
+
+    def _store_summary(self, inquiry, aged, summary):
+        inquiry.conversation_summary = summary.strip()
+        inquiry.summarized_through_id = aged[-1].id
+
+    def prepare(self, db, inquiry):
+        """
+        Update the inquiry's rolling summary and return the recent responses
+
+        Args:
+            db: Database session
+            inquiry: The Inquiry object
+
+        Returns:
+            list: The Response objects to include verbatim, oldest first
+        """
+        aged, recent = self._split(db.execute(self._unsummarized(inquiry)).scalars().all())
+        if aged:
+            try:
+                summary = self.chain.run(**self._summary_inputs(inquiry, aged))
+                self._store_summary(inquiry, aged, summary)
+                db.commit()
+            except Exception as e:
+                # Keep the previous summary; the aged turns are summarized next time
+                logger.error(f"Failed to update summary for inquiry {inquiry.id}: {str(e)}")
+        return recent
+
+    async def aprepare(self, db, inquiry):
+        """
+        Async variant of prepare that doesn't block the event loop on the LLM
+        or the database
+
+        Commits the session's read transaction, so objects must stay usable
+        after commit (expire_on_commit=False, as for every async session)
+
+        Args:
+            db: Async database session
+            inquiry: The Inquiry object
+
+        Returns:
+            list: The Response objects to include verbatim, oldest first
+        """
+        aged, recent = self._split((await db.execute(self._unsummarized(inquiry))).scalars().all())
+        # Return the connection to the pool while the LLM runs; the session
+        # keeps its objects and checks a connection out again to write
+        await db.commit()
+        if aged:
+            try:
+                summary = await self.chain.arun(**self._summary_inputs(inquiry, aged))
+                self._store_summary(inquiry, aged, summary)
+                await db.commit()
+            except Exception as e:
+                # Keep the previous summary; the aged turns are summarized next time
+                logger.error(f"Failed to update summary for inquiry {inquiry.id}: {str(e)}")
+        return recent
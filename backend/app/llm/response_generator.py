@@ -3,9 +3,9 @@ from langchain_core.prompts import PromptTemplate
 from langchain.chains import LLMChain
 from langchain_openai import ChatOpenAI
 
-from langchain_community.memory import ConversationBufferMemory
 from app.core.config import settings
 from app.db.models import InquiryType, Response
+from app.llm.history import format_turn
 
 # Define the response template
 response_template = """
@@ -41,12 +41,6 @@ class ResponseGenerator:
             openai_api_key=settings.OPENAI_API_KEY
         )
         
-        # Initialize memory
-        self.memory = ConversationBufferMemory(
-            input_key="inquiry_text",
-            memory_key="conversation_history"
-        )
-        
         # Create the prompt template
         self.prompt = PromptTemplate(
             input_variables=[
@@ -62,18 +56,40 @@ class ResponseGenerator:
         # Create the response chain
         self.chain = LLMChain(
             llm=self.llm,
-            prompt=self.prompt,
-            memory=self.memory
+            prompt=self.prompt
         )
     
-    def _format_conversation_history(self, previous_responses):
-        """Format previous responses into a readable conversation history"""
-        history = ""
-        for resp in previous_responses:
-            prefix = "Customer Support" if resp.is_automated else f"Agent ({resp.agent.name})"
-            history += f"{prefix}: {resp.content}\n\n"
+    def _format_conversation_history(self, inquiry, previous_responses):
+        """
+        Format this inquiry's rolling summary and recent turns
+        
+        previous_responses is the bounded window returned by
+        ConversationHistoryBuilder, so it is rendered as is.
+        """
+        history = "".join(f"{format_turn(resp)}\n\n" for resp in previous_responses or [])
+        
+        summary = inquiry.conversation_summary
+        if summary:
+            history = f"Summary of earlier conversation: {summary}\n\n{history}"
         return history
     
+    def _build_inputs(self, inquiry, previous_responses=None):
+        """Build the prompt inputs for an inquiry"""
+        # Format conversation history for this inquiry only
+        conversation_history = self._format_conversation_history(inquiry, previous_responses)
+        
+        # Get customer information
+        customer_name = inquiry.customer.name if inquiry.customer else "Valued Customer"
+        customer_email = inquiry.customer.email if inquiry.customer else "Unknown"
+        
+        return {
+            "customer_name": customer_name,
+            "customer_email": customer_email,
+            "inquiry_type": inquiry.inquiry_type.value if inquiry.inquiry_type else "general",
+            "conversation_history": conversation_history,
+            "inquiry_text": inquiry.content
+        }
+    
     def generate_response(self, inquiry, previous_responses=None):
         """
         Generate a response to the customer inquiry
@@ -85,22 +101,45 @@ class ResponseGenerator:
         Returns:
             str: The generated response text
         """
-        # Format conversation history if available
-        conversation_history = ""
-        if previous_responses:
-            conversation_history = self._format_conversation_history(previous_responses)
+        # Run the chain to generate a response
+        response_text = self.chain.run(**self._build_inputs(inquiry, previous_responses))
         
-        # Get customer information
-        customer_name = inquiry.customer.name if inquiry.customer else "Valued Customer"
-        customer_email = inquiry.customer.email if inquiry.customer else "Unknown"
+        return response_text.strip()
+    
+    async def agenerate_response(self, inquiry, previous_responses=None):
+        """
+        Async variant of generate_response that doesn't block the event loop
         
-        # Run the chain to generate a response
-        response_text = self.chain.run(
-            customer_name=customer_name,
-            customer_email=customer_email,
-            inquiry_type=inquiry.inquiry_type.value if inquiry.inquiry_type else "general",
-            conversation_history=conversation_history,
-            inquiry_text=inquiry.content
-        )
+        Args:
+            inquiry: The Inquiry object with customer details and text
+            previous_responses: List of previous Response objects for this inquiry
+            
+        Returns:
+            str: The generated response text
+        """
+        response_text = await self.chain.arun(**self._build_inputs(inquiry, previous_responses))
         
-        return response_text.strip()
\ No newline at end of file
+        return response_text.strip()
+    
+    def astream_response(self, inquiry, previous_responses=None):
+        """
+        Stream a response to the customer inquiry token by token
+        
+        The prompt is built before this returns, so the inquiry and its
+        relationships don't need to stay attached to a session while the
+        stream is consumed.
+        
+        Args:
+            inquiry: The Inquiry object with customer details and text
+            previous_responses: List of previous Response objects for this inquiry
+            
+        Returns:
+            AsyncIterator[str]: The response text in chunks as the LLM produces them
+        """
+        prompt_text = self.prompt.format(**self._build_inputs(inquiry, previous_responses))
+        return self._astream(prompt_text)
+    
+    async def _astream(self, prompt_text):
+        async for chunk in self.llm.astream(prompt_text):
+            if chunk.content:
+                yield chunk.content
@@ -0,0 +1,107 @@
+import asyncio
+import logging
+from sqlalchemy import select
+from app.db.session import AsyncSessionLocal
+from app.db.models import Inquiry, InquiryStatus
+from app.websocket.server import emit_new_inquiry, emit_escalation
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def apply_classification(inquiry, classification):
+    """Copy a classification result onto an Inquiry object"""
+    inquiry.inquiry_type = classification["type"]
+    inquiry.confidence_score = classification["confidence"]
+    inquiry.escalated = classification["should_escalate"]
+    inquiry.escalation_reason = classification["escalation_reason"]
+    inquiry.status = InquiryStatus.ESCALATED if classification["should_escalate"] else InquiryStatus.NEW
+
+class ClassificationWorkerPool:
+    """
+    Background workers that classify inquiries saved in the
+    PENDING_CLASSIFICATION state and notify clients when they finish.
+    """
+
+    def __init__(self, classifier, workers=4):
+        self.classifier = classifier
+        self.workers = workers
+        self.queue = None
+        self._tasks = []
+
+    async def start(self):
+        """Start the workers and re-queue inquiries left pending by a previous run"""
+        if self._tasks:
+            return
+
+        self.queue = asyncio.Queue()
+        self._tasks = [
+            asyncio.create_task(self._worker(i)) for i in range(self.workers)
+        ]
+
+        async with AsyncSessionLocal() as db:
+            pending_ids = (await db.execute(
+                select(Inquiry.id).filter(
+                    Inquiry.status == InquiryStatus.PENDING_CLASSIFICATION
+                ).order_by(Inquiry.id.asc())
+            )).scalars().all()
+
+        for inquiry_id in pending_ids:
+            self.enqueue(inquiry_id)
+
+        if pending_ids:
+            logger.info(f"Re-queued {len(pending_ids)} inquiries pending classification")
+
+    async def stop(self):
+        """Cancel the workers"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def enqueue(self, inquiry_id):
+        """Queue an inquiry for classification"""
+        if self.queue is None:
+            raise RuntimeError("Classification worker pool has not been started")
+        self.queue.put_nowait(inquiry_id)
+
+    async def _worker(self, worker_id):
+        while True:
+            inquiry_id = await self.queue.get()
+            try:
+                await self._classify(inquiry_id)
+            except Exception as e:
+                logger.error(f"Classification worker {worker_id} failed on inquiry {inquiry_id}: {str(e)}")
+            finally:
+                self.queue.task_done()
+
+    async def _classify(self, inquiry_id):
+        async with AsyncSessionLocal() as db:
+            inquiry = await db.get(Inquiry, inquiry_id)
+            if not inquiry or inquiry.status != InquiryStatus.PENDING_CLASSIFICATION:
+                return
+            # Don't hold the read transaction open while waiting on the LLM
+            await db.commit()
+
+            try:
+                classification = await self.classifier.aclassify(inquiry.content)
+            except Exception as e:
+                # Hand the inquiry to a human rather than leaving it pending forever
+                logger.error(f"Failed to classify inquiry {inquiry_id}: {str(e)}")
+                classification = {
+                    "type": inquiry.inquiry_type,
+                    "confidence": 0.0,
+                    "should_escalate": True,
+                    "escalation_reason": "Automatic classification failed"
+                }
+
+            apply_classification(inquiry, classification)
+            await db.commit()
+            await db.refresh(inquiry)
+
+            if inquiry.escalated:
+                await emit_escalation(inquiry, inquiry.escalation_reason)
+            else:
+                await emit_new_inquiry(inquiry)
+
+            logger.info(f"Classified inquiry {inquiry_id} as {inquiry.inquiry_type.value}")
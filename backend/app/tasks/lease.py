@@ -0,0 +1,84 @@
+import logging
+import os
+import socket
+import uuid
+from datetime import timedelta
+from sqlalchemy import or_, select, update
+from sqlalchemy.exc import IntegrityError
+from app.db.models import SchedulerLease, naive_utcnow
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class LeaderLease:
+    """
+    Renewable leader lease stored in the database.
+
+    Every API worker runs the scheduler loop, but only the worker holding
+    the lease does any work. Acquiring and renewing are a single atomic
+    UPDATE that only matches when the lease is free, expired or already
+    ours, so at most one worker holds it at a time. A worker that dies
+    simply stops renewing and another takes over once the lease expires.
+    """
+
+    def __init__(self, name, ttl_seconds=60, holder=None):
+        self.name = name
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.holder = holder or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+
+    async def acquire(self, db):
+        """
+        Acquire or renew the lease
+
+        Args:
+            db: Async database session
+
+        Returns:
+            bool: True if this process holds the lease until the new expiry
+        """
+        now = naive_utcnow()
+        try:
+            result = await db.execute(
+                update(SchedulerLease).where(
+                    SchedulerLease.name == self.name,
+                    or_(
+                        SchedulerLease.holder == self.holder,
+                        SchedulerLease.expires_at.is_(None),
+                        SchedulerLease.expires_at < now
+                    )
+                ).values(holder=self.holder, expires_at=now + self.ttl)
+            )
+            claimed = result.rowcount
+
+            if not claimed:
+                exists = (await db.execute(
+                    select(SchedulerLease.name).where(SchedulerLease.name == self.name)
+                )).first()
+                if not exists:
+                    # First run: create the lease row; a concurrent insert makes this fail
+                    db.add(SchedulerLease(name=self.name, holder=self.holder, expires_at=now + self.ttl))
+                    await db.flush()
+                    claimed = 1
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            claimed = 0
+
+        leader = bool(claimed)
+        if leader != self.is_leader:
+            logger.info(f"{self.holder} {'acquired' if leader else 'lost'} lease {self.name}")
+        self.is_leader = leader
+        return leader
+
+    async def release(self, db):
+        """Give up the lease so another worker can take over right away"""
+        await db.execute(
+            update(SchedulerLease).where(
+                SchedulerLease.name == self.name,
+                SchedulerLease.holder == self.holder
+            ).values(expires_at=None)
+        )
+        await db.commit()
+        self.is_leader = False
@@ -1,10 +1,17 @@
 import asyncio
+import heapq
 import logging
-from datetime import datetime, timedelta
-from app.db.session import SessionLocal
-from app.db.models import FollowUp, Inquiry, InquiryStatus, Response
+import time
+from collections import defaultdict
+from datetime import timedelta
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import joinedload
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal, SavepointSessionLocal
+from app.db.models import FollowUp, Inquiry, InquiryStatus, Response, naive_utcnow, to_utc_naive
 from app.llm.followup import FollowUpGenerator
 from app.websocket.server import emit_new_response
+from app.tasks.lease import LeaderLease
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -13,30 +20,265 @@ logger = logging.getLogger(__name__)
 # Initialize follow-up generator
 followup_generator = FollowUpGenerator()
 
-async def schedule_followups():
-    """Check for inquiries that need follow-ups and schedule them"""
-    logger.info("Checking for inquiries that need follow-ups...")
-    db = SessionLocal()
+class DeadlineQueue:
+    """
+    Min-heap of upcoming scheduler deadlines.
+    
+    SEND entries are keyed by follow-up ID and fire at its scheduled_at;
+    CHECK entries are keyed by inquiry ID and fire when the inquiry becomes
+    eligible for a follow-up. Pushing a key again replaces its deadline; the
+    old heap entry is skipped lazily when it surfaces.
+    """
+    
+    SEND = "send"
+    CHECK = "check"
+    
+    def __init__(self):
+        self._heap = []
+        self._deadlines = {}
+        self._wakeup = asyncio.Event()
+    
+    def push(self, due_at, kind, item_id):
+        """Add or replace the deadline for an item, waking the scheduler if it is sooner"""
+        due_at = to_utc_naive(due_at)
+        if due_at is None:
+            return
+        next_deadline = self.next_deadline()
+        
+        self._deadlines[(kind, item_id)] = due_at
+        heapq.heappush(self._heap, (due_at, kind, item_id))
+        
+        if next_deadline is None or due_at < next_deadline:
+            self._wakeup.set()
+    
+    def next_deadline(self):
+        """Return the earliest live deadline, or None if nothing is scheduled"""
+        while self._heap:
+            due_at, kind, item_id = self._heap[0]
+            if self._deadlines.get((kind, item_id)) == due_at:
+                return due_at
+            heapq.heappop(self._heap)
+        return None
+    
+    def pop_due(self, now):
+        """Remove and return the kinds of work whose deadline has passed"""
+        kinds = set()
+        while True:
+            due_at = self.next_deadline()
+            if due_at is None or due_at > now:
+                return kinds
+            _, kind, item_id = heapq.heappop(self._heap)
+            del self._deadlines[(kind, item_id)]
+            kinds.add(kind)
+    
+    async def wait(self, timeout):
+        """Sleep until the timeout passes or an earlier deadline is pushed"""
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=max(timeout, 0))
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+    
+    def clear(self):
+        self._heap = []
+        self._deadlines = {}
     
+    def __len__(self):
+        return len(self._deadlines)
+
+# Deadlines for the running scheduler; routes push new responses onto it
+followup_queue = DeadlineQueue()
+
+# Only the worker holding this lease runs follow-up work
+scheduler_lease = LeaderLease("followup-scheduler", ttl_seconds=settings.SCHEDULER_LEASE_SECONDS)
+
+async def renew_lease():
+    """Acquire or renew the scheduler lease with a short-lived session"""
     try:
-        # Get inquiries that might need follow-up
-        inquiries = db.query(Inquiry).filter(
-            Inquiry.status.in_([
-                InquiryStatus.IN_PROGRESS,
-                InquiryStatus.AWAITING_CUSTOMER
-            ])
-        ).all()
+        async with AsyncSessionLocal() as db:
+            return await scheduler_lease.acquire(db)
+    except Exception as e:
+        logger.error(f"Failed to renew scheduler lease: {str(e)}")
+        return False
+
+async def lease_held():
+    """Whether the last renewal kept the lease; checked before commits without a round trip"""
+    return scheduler_lease.is_leader
+
+async def run_while_leader(work, renew_interval):
+    """
+    Run scheduler work while renewing the lease in the background
+    
+    The lease is renewed every renew_interval seconds for as long as the
+    work runs, however long its LLM calls take. The work is only cancelled
+    when a renewal fails, so another worker may have taken over.
+    
+    Args:
+        work: Coroutine to run, e.g. schedule_followups()
+        renew_interval (float): Seconds between renewals, a fraction of the lease TTL
+    
+    Returns:
+        bool: False if the lease was lost and the work cancelled
+    """
+    task = asyncio.create_task(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=renew_interval)
+            if done:
+                task.result()
+                return True
+            if not await renew_lease():
+                logger.warning("Scheduler lease lost, cancelling follow-up work")
+                return False
+    finally:
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+def notify_new_response(inquiry_id, created_at):
+    """Schedule the follow-up eligibility check for a new response"""
+    followup_queue.push(
+        to_utc_naive(created_at) + timedelta(days=settings.FOLLOWUP_DAYS),
+        DeadlineQueue.CHECK,
+        inquiry_id
+    )
+
+async def load_deadlines(db):
+    """Rebuild the deadline queue from unsent follow-ups and open inquiries"""
+    followup_queue.clear()
+    
+    unsent = await db.execute(
+        select(FollowUp.id, FollowUp.scheduled_at).filter(FollowUp.sent_at.is_(None))
+    )
+    for followup_id, scheduled_at in unsent:
+        followup_queue.push(scheduled_at, DeadlineQueue.SEND, followup_id)
+    
+    last_responses = await db.execute(select(
+        Response.inquiry_id,
+        func.max(Response.created_at)
+    ).join(
+        Inquiry, Inquiry.id == Response.inquiry_id
+    ).filter(
+        Inquiry.status.in_([
+            InquiryStatus.IN_PROGRESS,
+            InquiryStatus.AWAITING_CUSTOMER
+        ])
+    ).group_by(Response.inquiry_id))
+    for inquiry_id, last_response_at in last_responses:
+        notify_new_response(inquiry_id, last_response_at)
+    
+    logger.info(f"Loaded {len(followup_queue)} scheduler deadlines")
+
+async def find_followup_candidates(db, now=None):
+    """
+    Select inquiries whose latest response is older than FOLLOWUP_DAYS
+    
+    One aggregate query replaces a response query per open inquiry.
+    Inquiries that already have an unsent follow-up are skipped.
+    
+    Returns:
+        list: (Inquiry, last_response_at) tuples
+    """
+    cutoff = (now or naive_utcnow()) - timedelta(days=settings.FOLLOWUP_DAYS)
+    
+    last_response = select(
+        Response.inquiry_id,
+        func.max(Response.created_at).label("last_response_at")
+    ).group_by(Response.inquiry_id).subquery()
+    
+    pending_followup = select(FollowUp.id).filter(
+        FollowUp.inquiry_id == Inquiry.id,
+        FollowUp.sent_at.is_(None)
+    ).exists()
+    
+    result = await db.execute(select(Inquiry, last_response.c.last_response_at).options(
+        joinedload(Inquiry.customer)
+    ).join(
+        last_response, last_response.c.inquiry_id == Inquiry.id
+    ).filter(
+        Inquiry.status.in_([
+            InquiryStatus.IN_PROGRESS,
+            InquiryStatus.AWAITING_CUSTOMER
+        ]),
+        last_response.c.last_response_at <= cutoff,
+        ~pending_followup
+    ))
+    return result.all()
+
+async def load_responses(db, inquiry_ids):
+    """Load the responses of several inquiries in one query, oldest first"""
+    responses = defaultdict(list)
+    if not inquiry_ids:
+        return responses
+    rows = (await db.execute(select(Response).filter(
+        Response.inquiry_id.in_(inquiry_ids)
+    ).order_by(Response.created_at.asc(), Response.id.asc()))).scalars()
+    for response in rows:
+        responses[response.inquiry_id].append(response)
+    return responses
+
+async def commit_followups(db, followups, heartbeat=None):
+    """
+    Commit new follow-ups and schedule their delivery
+    
+    Returns:
+        bool: False if the scheduler lease was lost and nothing was committed
+    """
+    if heartbeat is not None and not await heartbeat():
+        await db.rollback()
+        logger.warning(f"Scheduler lease lost, discarding {len(followups)} generated follow-ups")
+        return False
+    
+    await db.commit()
+    for followup in followups:
+        followup_queue.push(followup.scheduled_at, DeadlineQueue.SEND, followup.id)
+    return True
+
+async def schedule_followups(heartbeat=None):
+    """
+    Check for inquiries that need follow-ups and schedule them
+    
+    Args:
+        heartbeat: Optional coroutine function that renews the scheduler lease
+            and returns False once it is lost; checked before every commit.
+            run_scheduler passes lease_held, as run_while_leader does the renewing
+    """
+    logger.info("Checking for inquiries that need follow-ups...")
+    started = time.monotonic()
+    
+    async with AsyncSessionLocal() as db:
+        # Check which candidates need a follow-up
+        inquiries = [
+            inquiry for inquiry, last_response_at in await find_followup_candidates(db)
+            if followup_generator.should_generate_followup_since(inquiry, last_response_at)
+        ]
+        if not inquiries:
+            return
         
-        for inquiry in inquiries:
-            # Get the latest response for this inquiry
-            responses = db.query(Response).filter(
-                Response.inquiry_id == inquiry.id
-            ).order_by(Response.created_at.desc()).all()
-            
-            # Check if a follow-up is needed
-            if followup_generator.should_generate_followup(inquiry, responses):
-                # Generate follow-up
-                followup_data = followup_generator.generate_followup(inquiry, responses)
+        # Only now load the full conversations
+        responses = await load_responses(db, [inquiry.id for inquiry in inquiries])
+        # Don't hold the read transaction open while waiting on the LLM
+        await db.commit()
+        
+        # Generate follow-ups concurrently, with at most FOLLOWUP_CONCURRENCY LLM calls in flight
+        semaphore = asyncio.Semaphore(settings.FOLLOWUP_CONCURRENCY)
+        
+        async def generate(inquiry):
+            async with semaphore:
+                try:
+                    return await followup_generator.agenerate_followup(inquiry, responses[inquiry.id])
+                except Exception as e:
+                    logger.error(f"Failed to generate follow-up for inquiry {inquiry.id}: {str(e)}")
+                    return None
+        
+        scheduled = 0
+        uncommitted = []
+        tasks = [asyncio.create_task(generate(inquiry)) for inquiry in inquiries]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                followup_data = await next_result
+                if followup_data is None:
+                    continue
                 
                 # Create follow-up record
                 followup = FollowUp(
@@ -44,70 +286,189 @@ async def schedule_followups():
                     content=followup_data["content"],
                     scheduled_at=followup_data["scheduled_at"]
                 )
-                
                 db.add(followup)
-                db.commit()
-                db.refresh(followup)
+                uncommitted.append(followup)
                 
-                logger.info(f"Scheduled follow-up for inquiry {inquiry.id}")
-    finally:
-        db.close()
+                # Commit in batches rather than once per follow-up
+                if len(uncommitted) >= settings.FOLLOWUP_COMMIT_BATCH_SIZE:
+                    if not await commit_followups(db, uncommitted, heartbeat):
+                        break
+                    scheduled += len(uncommitted)
+                    uncommitted = []
+            else:
+                if uncommitted and await commit_followups(db, uncommitted, heartbeat):
+                    scheduled += len(uncommitted)
+        finally:
+            # Stop generating if the run ended early
+            for task in tasks:
+                task.cancel()
+        
+        duration = time.monotonic() - started
+        logger.info(
+            f"Scheduled {scheduled} follow-ups for {len(inquiries)} inquiries in {duration:.1f}s "
+            f"({scheduled / duration if duration else 0:.1f}/s)"
+        )
 
-async def send_followups():
-    """Send scheduled follow-ups that are due"""
-    logger.info("Sending scheduled follow-ups...")
-    db = SessionLocal()
+async def dispatch_followup_chunk(db, followups, now):
+    """
+    Turn a chunk of due follow-ups into responses in a single transaction
+    
+    The responses are inserted in bulk inside a savepoint. If that fails,
+    each follow-up is retried in its own savepoint so one bad row doesn't
+    sink the chunk. Inquiry statuses and follow-up flags are then set with
+    one UPDATE each and the chunk is committed once.
+    
+    Returns:
+        tuple: (Response objects created for the delivered follow-ups,
+        IDs of the follow-ups that failed)
+    """
+    def to_response(followup):
+        return Response(
+            inquiry_id=followup.inquiry_id,
+            content=followup.content,
+            is_automated=True
+        )
     
     try:
-        # Get follow-ups that are due
-        due_followups = db.query(FollowUp).filter(
-            FollowUp.scheduled_at <= datetime.now(),
-            FollowUp.sent_at.is_(None)
-        ).all()
-        
-        for followup in due_followups:
+        async with db.begin_nested():
+            responses = [to_response(followup) for followup in followups]
+            db.add_all(responses)
+        delivered = list(zip(followups, responses))
+    except Exception as e:
+        logger.warning(f"Bulk dispatch of {len(followups)} follow-ups failed, retrying one by one: {str(e)}")
+        delivered = []
+        for followup in followups:
             try:
-                # Create a response from the follow-up
-                response = Response(
-                    inquiry_id=followup.inquiry_id,
-                    content=followup.content,
-                    is_automated=True
-                )
-                
-                db.add(response)
-                db.commit()
-                db.refresh(response)
-                
-                # Update inquiry status
-                inquiry = db.query(Inquiry).filter(Inquiry.id == followup.inquiry_id).first()
-                if inquiry:
-                    inquiry.status = InquiryStatus.AWAITING_CUSTOMER
-                    db.commit()
-                
-                # Mark follow-up as sent
-                followup.sent_at = datetime.now()
-                followup.successful = True
-                db.commit()
-                
-                # Emit WebSocket event
-                await emit_new_response(response, followup.inquiry_id)
-                
-                logger.info(f"Sent follow-up for inquiry {followup.inquiry_id}")
+                async with db.begin_nested():
+                    response = to_response(followup)
+                    db.add(response)
+                delivered.append((followup, response))
             except Exception as e:
-                logger.error(f"Failed to send follow-up: {str(e)}")
-                followup.successful = False
-                db.commit()
-    finally:
-        db.close()
+                logger.error(f"Failed to send follow-up {followup.id}: {str(e)}")
+    
+    delivered_ids = {followup.id for followup, _ in delivered}
+    failed_ids = [followup.id for followup in followups if followup.id not in delivered_ids]
+    
+    if delivered:
+        await db.execute(update(Inquiry).filter(
+            Inquiry.id.in_({followup.inquiry_id for followup, _ in delivered})
+        ).values(status=InquiryStatus.AWAITING_CUSTOMER).execution_options(synchronize_session=False))
+        await db.execute(update(FollowUp).filter(
+            FollowUp.id.in_(delivered_ids)
+        ).values(sent_at=now, successful=True).execution_options(synchronize_session=False))
+    
+    if failed_ids:
+        await db.execute(update(FollowUp).filter(
+            FollowUp.id.in_(failed_ids)
+        ).values(successful=False).execution_options(synchronize_session=False))
+    
+    await db.commit()
+    return [response for _, response in delivered], failed_ids
+
+async def send_followups(heartbeat=None):
+    """
+    Send scheduled follow-ups that are due
+    
+    Args:
+        heartbeat: Optional coroutine function that renews the scheduler lease
+            and returns False once it is lost; checked before every chunk
+    """
+    logger.info("Sending scheduled follow-ups...")
+    
+    # dispatch_followup_chunk relies on savepoints
+    async with SavepointSessionLocal() as db:
+        now = naive_utcnow()
+        chunk_size = settings.FOLLOWUP_DISPATCH_CHUNK_SIZE
+        last_id = 0
+        
+        while True:
+            if heartbeat is not None and not await heartbeat():
+                logger.warning("Scheduler lease lost, leaving remaining follow-ups to the new leader")
+                break
+            
+            # Claim the next chunk of due follow-ups, with the customers to notify
+            rows = (await db.execute(select(FollowUp, Inquiry.customer_id).join(
+                Inquiry, Inquiry.id == FollowUp.inquiry_id
+            ).filter(
+                FollowUp.scheduled_at <= now,
+                FollowUp.sent_at.is_(None),
+                FollowUp.id > last_id
+            ).order_by(FollowUp.id.asc()).limit(chunk_size))).all()
+            if not rows:
+                break
+            due_followups = [followup for followup, _ in rows]
+            customer_ids = {followup.inquiry_id: customer_id for followup, customer_id in rows}
+            last_id = due_followups[-1].id
+            
+            sent, failed_ids = await dispatch_followup_chunk(db, due_followups, now)
+            logger.info(f"Sent {len(sent)} of {len(due_followups)} due follow-ups")
+            
+            # The new responses restart each inquiry's follow-up clock; failures are retried later
+            for response in sent:
+                notify_new_response(response.inquiry_id, response.created_at)
+            retry_at = now + timedelta(minutes=settings.FOLLOWUP_RETRY_MINUTES)
+            for followup_id in failed_ids:
+                followup_queue.push(retry_at, DeadlineQueue.SEND, followup_id)
+            
+            # Emit WebSocket events once the chunk is committed
+            results = await asyncio.gather(
+                *(
+                    emit_new_response(response, response.inquiry_id, customer_ids.get(response.inquiry_id))
+                    for response in sent
+                ),
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.error(f"Failed to emit follow-up response: {str(result)}")
+            
+            if len(due_followups) < chunk_size:
+                break
 
 async def run_scheduler():
-    """Run the scheduler in a loop"""
+    """
+    Run the scheduler, sleeping until the next follow-up deadline
+    
+    Every worker runs this loop, but only the one holding the scheduler
+    lease does any work; the others just retry the lease periodically.
+    The leader loads the deadline queue when it takes over and rebuilds it
+    every SCHEDULER_RESYNC_MINUTES to pick up changes made by other workers.
+    While it works, the lease is renewed every third of its TTL.
+    """
+    resync_interval = timedelta(minutes=settings.SCHEDULER_RESYNC_MINUTES)
+    lease_interval = timedelta(seconds=settings.SCHEDULER_LEASE_SECONDS / 3)
+    last_sync = None
+    
     while True:
         try:
-            await schedule_followups()
-            await send_followups()
+            if not await renew_lease():
+                # Standby: drop local deadlines and reload them if we take over
+                followup_queue.clear()
+                last_sync = None
+                await asyncio.sleep(lease_interval.total_seconds())
+                continue
+            
+            now = naive_utcnow()
+            if last_sync is None or now - last_sync >= resync_interval:
+                async with AsyncSessionLocal() as db:
+                    await load_deadlines(db)
+                last_sync = now
+            
+            due = followup_queue.pop_due(now)
+            renew_interval = lease_interval.total_seconds()
+            if DeadlineQueue.CHECK in due:
+                if not await run_while_leader(schedule_followups(heartbeat=lease_held), renew_interval):
+                    continue
+            if DeadlineQueue.SEND in due:
+                await run_while_leader(send_followups(heartbeat=lease_held), renew_interval)
         except Exception as e:
             logger.error(f"Scheduler error: {str(e)}")
         
-        # Wait for next run (every 15 minutes)
-        await asyncio.sleep(15 * 60)
\ No newline at end of file
+        # Sleep until the next deadline, a sooner one is pushed, the next resync
+        # or the next lease renewal
+        now = naive_utcnow()
+        wake_at = min((last_sync or now) + resync_interval, now + lease_interval)
+        next_deadline = followup_queue.next_deadline()
+        if next_deadline is not None:
+            wake_at = min(wake_at, next_deadline)
+        await followup_queue.wait((wake_at - now).total_seconds())
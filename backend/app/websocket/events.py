@@ -0,0 +1,80 @@
+import orjson
+
+# Bumped whenever a payload field is renamed, removed or changes meaning
+EVENT_SCHEMA_VERSION = 1
+
+class OrjsonCodec:
+    """
+    json-module stand-in for python-socketio and engine.io.
+
+    Passed as the server's json option, so every packet is encoded with
+    orjson. An event sent to several rooms in one emit is encoded once and
+    the same packet is written to every recipient.
+    """
+
+    @staticmethod
+    def dumps(obj, **kwargs):
+        return orjson.dumps(obj).decode("utf-8")
+
+    @staticmethod
+    def loads(data, **kwargs):
+        return orjson.loads(data)
+
+def _timestamp(value):
+    return value.isoformat() if value is not None else None
+
+def _enum_value(value):
+    return value.value if value is not None else None
+
+def inquiry_fields(inquiry):
+    """The public fields of an Inquiry row, as JSON-ready values"""
+    return {
+        "id": inquiry.id,
+        "customer_id": inquiry.customer_id,
+        "subject": inquiry.subject,
+        "content": inquiry.content,
+        "inquiry_type": _enum_value(inquiry.inquiry_type),
+        "status": _enum_value(inquiry.status),
+        "confidence_score": inquiry.confidence_score,
+        "escalated": bool(inquiry.escalated),
+        "escalation_reason": inquiry.escalation_reason,
+        "created_at": _timestamp(inquiry.created_at),
+        "updated_at": _timestamp(inquiry.updated_at)
+    }
+
+def response_fields(response):
+    """The public fields of a Response row, as JSON-ready values"""
+    return {
+        "id": response.id,
+        "inquiry_id": response.inquiry_id,
+        "agent_id": response.agent_id,
+        "content": response.content,
+        "is_automated": bool(response.is_automated),
+        "created_at": _timestamp(response.created_at)
+    }
+
+def followup_fields(followup):
+    """The public fields of a FollowUp row, as JSON-ready values"""
+    return {
+        "id": followup.id,
+        "inquiry_id": followup.inquiry_id,
+        "content": followup.content,
+        "scheduled_at": _timestamp(followup.scheduled_at),
+        "sent_at": _timestamp(followup.sent_at),
+        "successful": followup.successful
+    }
+
+def event_payload(fields, **extra):
+    """
+    Wrap row fields as an event payload carrying the schema version
+
+    Args:
+        fields (dict): Output of one of the *_fields functions
+        **extra: Additional top-level keys
+
+    Returns:
+        dict: The payload, built once and sent to every room of the event
+    """
+    payload = {"schema_version": EVENT_SCHEMA_VERSION, **fields}
+    payload.update(extra)
+    return payload
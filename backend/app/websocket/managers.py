@@ -0,0 +1,216 @@
+import asyncio
+import hashlib
+import os
+import pickle
+import socket
+import stat
+import threading
+import time
+from collections import deque
+
+import socketio
+from socketio.async_pubsub_manager import AsyncPubSubManager
+
+from app.core.config import settings
+
+# Largest message a peer can receive; Linux caps datagrams near the default socket buffer size
+MAX_DATAGRAM_SIZE = 256 * 1024
+
+# Longest Unix socket path the kernel accepts (sun_path is 108 bytes including the terminator)
+MAX_SOCKET_PATH = 107
+
+class DeliveryMetrics:
+    """
+    Cross-worker delivery counters for a pub/sub client manager.
+
+    Latency runs from the moment a worker publishes an event to the moment
+    another worker has handed it to its own sockets. Timestamps come from
+    each worker's wall clock, so across hosts the figures include clock skew.
+    """
+
+    def __init__(self, samples=1000):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=samples)
+        self.published = 0
+        self.delivered = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def record_publish(self):
+        with self._lock:
+            self.published += 1
+
+    def record_delivery(self, seconds):
+        with self._lock:
+            self.delivered += 1
+            self.total_latency += seconds
+            self.max_latency = max(self.max_latency, seconds)
+            self._latencies.append(seconds)
+
+    def stats(self):
+        """Return the counters and latency percentiles over the recent deliveries"""
+        with self._lock:
+            recent = sorted(self._latencies)
+            stats = {
+                "published": self.published,
+                "delivered": self.delivered,
+                "avg_latency_ms": self.total_latency / self.delivered * 1000 if self.delivered else 0.0,
+                "max_latency_ms": self.max_latency * 1000
+            }
+        for name, quantile in (("p50_latency_ms", 0.5), ("p99_latency_ms", 0.99)):
+            stats[name] = recent[min(int(len(recent) * quantile), len(recent) - 1)] * 1000 if recent else 0.0
+        return stats
+
+def with_delivery_metrics(manager_class, metrics):
+    """
+    Subclass a pub/sub client manager to time cross-worker delivery
+
+    Args:
+        manager_class: An AsyncPubSubManager subclass
+        metrics (DeliveryMetrics): Where publishes and delivery latencies are recorded
+
+    Returns:
+        type: The instrumented manager class
+    """
+    class InstrumentedManager(manager_class):
+        async def _publish(self, data):
+            metrics.record_publish()
+            return await super()._publish(dict(data, published_at=time.time()))
+
+        async def _handle_emit(self, message):
+            await super()._handle_emit(message)
+            # Only messages from other workers carry a publish time
+            published_at = message.get("published_at")
+            if published_at is not None:
+                metrics.record_delivery(time.time() - published_at)
+
+    InstrumentedManager.__name__ = f"Instrumented{manager_class.__name__}"
+    return InstrumentedManager
+
+class UnixSocketManager(AsyncPubSubManager):
+    """
+    Client manager that fans events out between workers on one host.
+
+    Each worker that has sockets connected binds a Unix datagram socket
+    named after its host ID in a shared directory, and publishing sends the
+    message to every other socket found there. There is no broker to run,
+    which suits single-host deployments and tests. A message is dropped for
+    a peer whose receive queue is full, and messages larger than the
+    kernel's datagram limit (around 200 KB on Linux) can't be sent.
+    """
+    name = "unix"
+
+    def __init__(self, directory, channel="socketio", write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.directory = directory
+        self._check_directory()
+
+        # Short names keep the path within the kernel's limit
+        self._prefix = hashlib.blake2b(channel.encode("utf-8"), digest_size=4).hexdigest() + "-"
+        self.path = os.path.join(directory, f"{self._prefix}{self.host_id[:12]}.sock")
+        if len(os.fsencode(self.path)) > MAX_SOCKET_PATH:
+            raise ValueError(f"Socket.IO socket path {self.path} is longer than {MAX_SOCKET_PATH} bytes")
+
+        self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sender.setblocking(False)
+        self._receiver = None
+
+    def _check_directory(self):
+        """Create the socket directory, refusing one another user could write to"""
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        # Peers unpickle what they receive, so anyone able to bind a socket here could run code
+        info = os.lstat(self.directory)
+        if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or stat.S_IMODE(info.st_mode) != 0o700:
+            raise PermissionError(
+                f"Socket.IO directory {self.directory} must be a directory owned by this user with mode 0700"
+            )
+
+    def initialize(self):
+        # Bind before the listener starts, so a bad path fails once instead of on every retry
+        if not self.write_only and self._receiver is None:
+            receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            try:
+                receiver.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, MAX_DATAGRAM_SIZE * 4)
+                receiver.bind(self.path)
+            except OSError:
+                receiver.close()
+                raise
+            receiver.setblocking(False)
+            self._receiver = receiver
+        super().initialize()
+
+    def _peers(self):
+        with os.scandir(self.directory) as entries:
+            return [
+                entry.path for entry in entries
+                if entry.name.startswith(self._prefix) and entry.name.endswith(".sock") and entry.path != self.path
+            ]
+
+    async def _publish(self, data):
+        payload = pickle.dumps(data)
+        for peer in self._peers():
+            try:
+                self._sender.sendto(payload, peer)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Left behind by a worker that exited without cleaning up
+                try:
+                    os.unlink(peer)
+                except FileNotFoundError:
+                    pass
+            except BlockingIOError:
+                self._get_logger().warning(f"Socket.IO peer {peer} is not keeping up, message dropped")
+            except OSError as e:
+                self._get_logger().error(f"Cannot publish to Socket.IO peer {peer}: {str(e)}")
+
+    async def _listen(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            yield await loop.sock_recv(self._receiver, MAX_DATAGRAM_SIZE)
+
+    def close(self):
+        """Stop receiving and remove this worker's socket from the directory"""
+        thread = getattr(self, "thread", None)
+        if thread is not None:
+            thread.cancel()
+        self._sender.close()
+        if self._receiver is not None:
+            self._receiver.close()
+            self._receiver = None
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+MANAGER_CLASSES = {
+    "redis": socketio.AsyncRedisManager,
+    "aiopika": socketio.AsyncAioPikaManager,
+    "unix": UnixSocketManager,
+}
+
+def create_client_manager(metrics, kind=None):
+    """
+    Build the Socket.IO client manager selected by SOCKETIO_MANAGER
+
+    "memory" keeps sockets in this process only, "unix" shares events
+    between workers on the same host, and "redis" or "aiopika" go through
+    the message queue at SOCKETIO_MESSAGE_QUEUE.
+
+    Args:
+        metrics (DeliveryMetrics): Records cross-worker delivery latency
+        kind (str): Overrides SOCKETIO_MANAGER
+
+    Returns:
+        The client manager, or None for the default in-memory manager
+    """
+    kind = (kind or settings.SOCKETIO_MANAGER).lower()
+    if kind == "memory":
+        return None
+    if kind not in MANAGER_CLASSES:
+        raise ValueError(f"Unknown SOCKETIO_MANAGER: {kind}")
+
+    manager_class = with_delivery_metrics(MANAGER_CLASSES[kind], metrics)
+    if kind == "unix":
+        return manager_class(settings.SOCKETIO_UNIX_DIR, channel=settings.SOCKETIO_CHANNEL)
+    if settings.SOCKETIO_MESSAGE_QUEUE:
+        return manager_class(settings.SOCKETIO_MESSAGE_QUEUE, channel=settings.SOCKETIO_CHANNEL)
+    return manager_class(channel=settings.SOCKETIO_CHANNEL)
@@ -1,16 +1,26 @@
 import socketio
 import logging
+from collections import defaultdict
 from typing import Dict, Set
 from app.core.config import settings
+from app.core.security import load_user, verify_token
+from app.db.session import AsyncSessionLocal
+from app.websocket.managers import DeliveryMetrics, create_client_manager
+from app.websocket.events import OrjsonCodec, event_payload, inquiry_fields, response_fields
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Cross-worker delivery latency of the configured client manager
+delivery_metrics = DeliveryMetrics()
+
 # Create Socket.IO server
 sio = socketio.AsyncServer(
     async_mode='asgi', 
-    cors_allowed_origins=settings.ORIGINS
+    cors_allowed_origins=settings.ORIGINS,
+    client_manager=create_client_manager(delivery_metrics),
+    json=OrjsonCodec
 )
 
 # Create ASGI app for Socket.IO server
@@ -22,20 +32,60 @@ connected_clients: Dict[str, Set[str]] = {
     'customers': set()  # Customer room for updates
 }
 
+# Sockets of each authenticated user, and the user behind each socket
+user_sids: Dict[int, Set[str]] = defaultdict(set)
+sid_users: Dict[str, int] = {}
+
+def user_room(user_id):
+    """Name of the room every socket of a user joins on connect"""
+    return f"user_{user_id}"
+
+def has_local_sockets_only():
+    """
+    Whether this process sees every connected socket
+
+    True with the default in-memory client manager; a shared manager may
+    route a user's room to sockets held by other workers.
+    """
+    return type(sio.manager) is socketio.AsyncManager
+
+def socket_stats():
+    """Report connected sockets and cross-worker delivery for monitoring"""
+    return {
+        "manager": settings.SOCKETIO_MANAGER,
+        "sockets": len(sid_users),
+        "users": len(user_sids),
+        **delivery_metrics.stats()
+    }
+
+def close_client_manager():
+    """Release the client manager's resources, such as a Unix socket file"""
+    close = getattr(sio.manager, 'close', None)
+    if close is not None:
+        close()
+
 # Socket.IO event handlers
 @sio.event
 async def connect(sid, environ, auth):
     """Handle client connection"""
     logger.info(f"Client connected: {sid}")
     
-    # Verify authentication token (simplified for now)
+    # Verify authentication token
     token = auth.get('token') if auth else None
     if not token:
         logger.warning(f"Client {sid} connection rejected: No authentication token")
         return False
     
-    # In a real app, validate token and get user role
-    # For now, we'll assume all connections are valid
+    user_id = verify_token(token)
+    if user_id is None:
+        logger.warning(f"Client {sid} connection rejected: Invalid authentication token")
+        return False
+    
+    # Deliver the user's own events to every socket they have open
+    user_sids[user_id].add(sid)
+    sid_users[sid] = user_id
+    await sio.enter_room(sid, user_room(user_id))
+    
     await sio.emit('connect_success', {'status': 'connected'}, to=sid)
     return True
 
@@ -44,11 +94,28 @@ async def disconnect(sid):
     """Handle client disconnection"""
     logger.info(f"Client disconnected: {sid}")
     
+    user_id = sid_users.pop(sid, None)
+    if user_id is not None:
+        sids = user_sids.get(user_id)
+        if sids is not None:
+            sids.discard(sid)
+            if not sids:
+                del user_sids[user_id]
+    
     # Remove from all rooms
     for room in connected_clients:
         if sid in connected_clients[room]:
             connected_clients[room].remove(sid)
 
+async def is_agent(sid):
+    """Whether the user behind a socket may see every customer's events (admins only)"""
+    user_id = sid_users.get(sid)
+    if user_id is None:
+        return False
+    async with AsyncSessionLocal() as db:
+        user = await load_user(db, user_id)
+    return user is not None and user.is_admin
+
 @sio.event
 async def join(sid, data):
     """Handle client joining a room"""
@@ -57,6 +124,11 @@ async def join(sid, data):
         logger.warning(f"Client {sid} tried to join invalid room: {room}")
         return
     
+    # The agents room gets every customer's events
+    if room == 'agents' and not await is_agent(sid):
+        logger.warning(f"Client {sid} tried to join {room} without agent rights")
+        return
+    
     logger.info(f"Client {sid} joined room: {room}")
     connected_clients[room].add(sid)
     await sio.enter_room(sid, room)
@@ -74,55 +146,61 @@ async def leave(sid, data):
     await sio.leave_room(sid, room)
 
 # Event emitters
+def recipient_rooms(customer_id=None):
+    """
+    Rooms an event goes to: agents, plus the customer's own room
+    
+    The customer's room is left out when none of their sockets is connected,
+    so offline customers cost nothing. Sending to all rooms in one emit
+    encodes the payload once and delivers it once to a socket in several rooms.
+    """
+    rooms = ['agents']
+    if customer_id and (not has_local_sockets_only() or customer_id in user_sids):
+        rooms.append(user_room(customer_id))
+    return rooms
+
 async def emit_new_inquiry(inquiry):
     """Emit new inquiry event to agents"""
     logger.info(f"Emitting new inquiry event: {inquiry.id}")
-    await sio.emit('new_inquiry', inquiry.dict(), room='agents')
+    await sio.emit('new_inquiry', event_payload(inquiry_fields(inquiry)), room='agents')
 
 async def emit_inquiry_updated(inquiry):
-    """Emit inquiry updated event to relevant clients"""
+    """Emit inquiry updated event to agents and the inquiry's customer"""
     logger.info(f"Emitting inquiry updated event: {inquiry.id}")
-    # Send to agents room
-    await sio.emit('inquiry_updated', inquiry.dict(), room='agents')
-    
-    # Send to specific customer if applicable
-    if inquiry.customer_id:
-        customer_sid = f"customer_{inquiry.customer_id}"
-        await sio.emit('inquiry_updated', inquiry.dict(), room=customer_sid)
+    await sio.emit(
+        'inquiry_updated',
+        event_payload(inquiry_fields(inquiry)),
+        room=recipient_rooms(inquiry.customer_id)
+    )
 
-async def emit_new_response(response, inquiry_id):
-    """Emit new response event to relevant clients"""
-    logger.info(f"Emitting new response event for inquiry: {inquiry_id}")
-    # Convert to dict for serialization
-    response_data = response.dict()
-    response_data['inquiry_id'] = inquiry_id
-    
-    # Send to agents room
-    await sio.emit('new_response', response_data, room='agents')
+async def emit_new_response(response, inquiry_id, customer_id=None):
+    """
+    Emit new response event to agents and the inquiry's customer
     
-    # Send to specific customer if applicable
-    inquiry = await get_inquiry(inquiry_id)  # You'll need to implement this function
-    if inquiry and inquiry.customer_id:
-        customer_sid = f"customer_{inquiry.customer_id}"
-        await sio.emit('new_response', response_data, room=customer_sid)
+    Args:
+        response: The saved response
+        inquiry_id (int): ID of the inquiry answered
+        customer_id (int): ID of the inquiry's customer, who also gets the event
+    """
+    logger.info(f"Emitting new response event for inquiry: {inquiry_id}")
+    await sio.emit(
+        'new_response',
+        event_payload(response_fields(response), inquiry_id=inquiry_id),
+        room=recipient_rooms(customer_id)
+    )
+
+async def emit_response_chunk(inquiry_id, content, index):
+    """Emit a chunk of a response that is still being generated to agents"""
+    await sio.emit('response_chunk', event_payload({
+        'inquiry_id': inquiry_id,
+        'content': content,
+        'index': index
+    }), room='agents')
 
 async def emit_escalation(inquiry, reason):
     """Emit escalation event to agents"""
     logger.info(f"Emitting escalation event: {inquiry.id}")
-    await sio.emit('escalation', {
-        'inquiry': inquiry.dict(),
+    await sio.emit('escalation', event_payload({
+        'inquiry': inquiry_fields(inquiry),
         'reason': reason
-    }, room='agents')
-
-# Helper function to get inquiry
-async def get_inquiry(inquiry_id):
-    """Get inquiry by ID"""
-    from app.db.session import SessionLocal
-    from app.db.models import Inquiry
-    
-    db = SessionLocal()
-    try:
-        inquiry = db.query(Inquiry).filter(Inquiry.id == inquiry_id).first()
-        return inquiry
-    finally:
-        db.close()
\ No newline at end of file
+    }), room='agents')
@@ -1,20 +1,30 @@
 import asyncio
-from app.tasks.scheduler import run_scheduler
-from fastapi import FastAPI
+from app.tasks.scheduler import run_scheduler, scheduler_lease
+from fastapi import Depends, FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.routes import inquiries, responses, users
+from app.api.pagination import NEXT_CURSOR_HEADER
 from app.core.config import settings
-from app.db.session import engine
+from app.db.session import (
+    engine, SessionLocal, async_engine, AsyncSessionLocal, pool_metrics, async_pool_metrics
+)
+from app.core.security import get_current_admin
 from app.db.models import Base
-from app.websocket.server import socket_app
+from app.db.migrations import run_migrations
+from app.websocket.server import socket_app, socket_stats, close_client_manager
+from app.llm.answer_reuse import answer_index, reload_answer_index
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
+run_migrations(engine)
 
 app = FastAPI(
     title="AI Customer Support API",
     description="API for AI-powered customer support agent",
-    version="0.1.0"
+    version="0.1.0",
+    # Encode response bodies with orjson instead of the stdlib json module
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -24,6 +34,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Let browser clients read the keyset pagination cursor
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # Include routers
@@ -38,11 +50,49 @@ app.mount("/ws", socket_app)
 async def health_check():
     return {"status": "healthy", "message": "AI Customer Support API is running"}
 
+@app.get("/api/db/stats", tags=["health"])
+async def get_db_stats(current_user=Depends(get_current_admin)):
+    """Report connection pool usage and checkout wait times"""
+    return {
+        "sync": pool_metrics.stats(engine.pool),
+        "async": async_pool_metrics.stats(async_engine.sync_engine.pool)
+    }
+
+@app.get("/api/socketio/stats", tags=["health"])
+async def get_socketio_stats(current_user=Depends(get_current_admin)):
+    """Report connected sockets and cross-worker event delivery latency"""
+    return socket_stats()
+
 @app.on_event("startup")
 async def startup_event():
     """Start background tasks when the application starts"""
     # Start scheduler in the background
     asyncio.create_task(run_scheduler())
+    
+    # Start the workers for deferred classification
+    await inquiries.classification_pool.start()
+    
+    # Index previously resolved inquiries for answer reuse
+    if settings.ANSWER_REUSE_ENABLED:
+        db = SessionLocal()
+        try:
+            answer_index.load(db)
+        finally:
+            db.close()
+        if settings.ANSWER_REUSE_RELOAD_MINUTES > 0:
+            asyncio.create_task(reload_answer_index(SessionLocal, settings.ANSWER_REUSE_RELOAD_MINUTES * 60))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background workers when the application shuts down"""
+    await inquiries.classification_pool.stop()
+    users.password_executor.shutdown(wait=False)
+    close_client_manager()
+    
+    # Hand the scheduler over to another worker without waiting for the lease to expire
+    async with AsyncSessionLocal() as db:
+        await scheduler_lease.release(db)
+    await async_engine.dispose()
 
 if __name__ == "__main__":
     import uvicorn
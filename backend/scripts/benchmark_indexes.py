@@ -0,0 +1,162 @@
+"""
+Benchmark the hot query shapes with and without the composite indexes.
+
+Builds a throwaway SQLite database with the application schema, fills it
+with synthetic inquiries, responses and follow-ups, then prints the query
+plan and median timing of each query before and after the indexes declared
+on the models are created.
+
+Usage (from the backend directory):
+    python -m scripts.benchmark_indexes --rows 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+
+from app.db.migrations import create_indexes_if_missing
+from app.db.models import Base, Inquiry, Response, FollowUp, InquiryStatus, InquiryType
+
+TABLES = (Inquiry.__table__, Response.__table__, FollowUp.__table__)
+
+# The queries issued by list_inquiries, the response routes and the scheduler
+QUERIES = [
+    ("list inquiries (admin)",
+     "SELECT * FROM inquiries ORDER BY created_at DESC LIMIT 20"),
+    ("list inquiries by customer",
+     "SELECT * FROM inquiries WHERE customer_id = :customer_id ORDER BY created_at DESC LIMIT 20"),
+    ("list inquiries by status",
+     "SELECT * FROM inquiries WHERE status = :status ORDER BY created_at DESC LIMIT 20"),
+    ("list escalated inquiries",
+     "SELECT * FROM inquiries WHERE escalated = 1 ORDER BY created_at DESC LIMIT 20"),
+    ("list inquiries by type",
+     "SELECT * FROM inquiries WHERE inquiry_type = :inquiry_type ORDER BY created_at DESC LIMIT 20"),
+    ("responses for an inquiry",
+     "SELECT * FROM responses WHERE inquiry_id = :inquiry_id ORDER BY created_at, id"),
+    ("due follow-ups",
+     "SELECT * FROM followups WHERE scheduled_at <= :now AND sent_at IS NULL AND id > 0 "
+     "ORDER BY id LIMIT 100"),
+    ("unsent follow-up for an inquiry",
+     "SELECT id FROM followups WHERE inquiry_id = :inquiry_id AND sent_at IS NULL LIMIT 1"),
+]
+
+def timestamp(value):
+    """Format a datetime the way SQLAlchemy stores it in SQLite"""
+    return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+def populate(engine, rows, seed=42):
+    """Insert `rows` inquiries, responses and follow-ups"""
+    rng = random.Random(seed)
+    start = datetime.now() - timedelta(days=365)
+    customers = max(rows // 50, 1)
+    statuses = [status.name for status in InquiryStatus]
+    types = [inquiry_type.name for inquiry_type in InquiryType]
+
+    def created(i):
+        return timestamp(start + timedelta(seconds=i * 365 * 86400 // rows))
+
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.execute("PRAGMA journal_mode = OFF")
+        cursor.execute("PRAGMA synchronous = OFF")
+        cursor.executemany(
+            "INSERT INTO inquiries (id, customer_id, subject, content, inquiry_type, confidence_score, "
+            "status, escalated, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (i, rng.randint(1, customers), f"Inquiry {i}", "Synthetic inquiry", rng.choice(types),
+                 rng.random(), rng.choice(statuses), int(rng.random() < 0.05), created(i))
+                for i in range(1, rows + 1)
+            )
+        )
+        cursor.executemany(
+            "INSERT INTO responses (id, inquiry_id, content, is_automated, created_at) VALUES (?, ?, ?, ?, ?)",
+            (
+                (i, rng.randint(1, rows), "Synthetic response", 1, created(i))
+                for i in range(1, rows + 1)
+            )
+        )
+        now = start + timedelta(days=365)
+        cursor.executemany(
+            "INSERT INTO followups (id, inquiry_id, content, scheduled_at, sent_at, successful) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (i, rng.randint(1, rows), "Synthetic follow-up", created(i),
+                 None if i > rows - rows // 100 else created(i), None)
+                for i in range(1, rows + 1)
+            )
+        )
+        raw.commit()
+    finally:
+        raw.close()
+    return {"customer_id": customers // 2, "status": InquiryStatus.ESCALATED.name,
+            "inquiry_type": InquiryType.BILLING.name, "inquiry_id": rows // 2,
+            "now": timestamp(now)}
+
+def drop_indexes(engine):
+    """Drop the model-declared indexes to get the unindexed baseline"""
+    with engine.begin() as conn:
+        for table in TABLES:
+            for index in table.indexes:
+                conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+
+def run_queries(engine, params, repeat):
+    """Return {name: (plan, median_ms)} for every benchmark query"""
+    results = {}
+    with engine.connect() as conn:
+        for name, sql in QUERIES:
+            plan = " | ".join(row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params))
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                conn.execute(text(sql), params).fetchall()
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = (plan, statistics.median(timings))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Rows per table")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per query (median is reported)")
+    parser.add_argument("--db", help="SQLite file to use (default: a temporary file)")
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), "benchmark.db")
+    engine = create_engine(f"sqlite:///{path}")
+    try:
+        Base.metadata.create_all(bind=engine, tables=list(TABLES))
+        drop_indexes(engine)
+
+        print(f"Populating {args.rows} rows per table in {path}...")
+        params = populate(engine, args.rows)
+
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+        before = run_queries(engine, params, args.repeat)
+
+        started = time.perf_counter()
+        with engine.begin() as conn:
+            create_indexes_if_missing(conn, *TABLES)
+            conn.execute(text("ANALYZE"))
+        print(f"Created indexes in {time.perf_counter() - started:.1f}s\n")
+        after = run_queries(engine, params, args.repeat)
+
+        for name, _ in QUERIES:
+            plan_before, ms_before = before[name]
+            plan_after, ms_after = after[name]
+            print(name)
+            print(f"  before: {ms_before:9.2f} ms  {plan_before}")
+            print(f"  after:  {ms_after:9.2f} ms  {plan_after}")
+            print(f"  speedup: {ms_before / max(ms_after, 1e-6):.0f}x\n")
+    finally:
+        engine.dispose()
+        if not args.db:
+            os.remove(path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Benchmark list_inquiries serialization: response_model versus row tuples.
+
+Builds a throwaway SQLite database with synthetic inquiries and measures
+requests per second for a 100-row page served two ways, in process over
+ASGI so only the application's own work is timed:
+
+  before  select(Inquiry) ORM objects, validated through
+          response_model=List[InquiryResponse] and encoded with stdlib json
+  after   the current list_inquiries route: the response columns only,
+          encoded straight to JSON with orjson
+
+Usage (from the backend directory):
+    python -m scripts.benchmark_serialization --requests 2000
+"""
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+import httpx
+from fastapi import Depends, FastAPI
+from fastapi.responses import JSONResponse, ORJSONResponse
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.api.routes import inquiries
+from app.api.routes.inquiries import InquiryResponse
+from app.core.auth_cache import UserSnapshot
+from app.core.security import get_current_user
+from app.db.models import Base, Inquiry, InquiryStatus, InquiryType
+from app.db.session import get_async_db
+
+def populate(engine, rows):
+    start = datetime.now() - timedelta(days=30)
+    with engine.begin() as conn:
+        conn.execute(Inquiry.__table__.insert(), [
+            {
+                "customer_id": i % 50 + 1,
+                "subject": f"Inquiry {i}",
+                "content": "I was charged twice for my subscription this month, please help.",
+                "inquiry_type": list(InquiryType)[i % len(InquiryType)],
+                "status": list(InquiryStatus)[i % len(InquiryStatus)],
+                "confidence_score": 0.87,
+                "escalated": i % 20 == 0,
+                "escalation_reason": "Low confidence" if i % 20 == 0 else None,
+                "created_at": start + timedelta(seconds=i)
+            }
+            for i in range(rows)
+        ])
+
+def build_apps(session_factory):
+    async def override_get_async_db():
+        async with session_factory() as db:
+            yield db
+
+    async def admin():
+        return UserSnapshot(1, "admin@example.com", "Admin", True)
+
+    # The route as it was: ORM rows through the response model and stdlib json
+    before = FastAPI(default_response_class=JSONResponse)
+
+    @before.get("/api/inquiries/", response_model=List[InquiryResponse])
+    async def list_inquiries(limit: int = 100, db: AsyncSession = Depends(get_async_db)):
+        result = await db.execute(
+            select(Inquiry).order_by(Inquiry.created_at.desc(), Inquiry.id.desc()).limit(limit)
+        )
+        return result.scalars().all()
+
+    after = FastAPI(default_response_class=ORJSONResponse)
+    after.include_router(inquiries.router, prefix="/api/inquiries")
+
+    for app in (before, after):
+        app.dependency_overrides[get_async_db] = override_get_async_db
+        app.dependency_overrides[get_current_user] = admin
+    return {"before": before, "after": after}
+
+async def measure(app, requests, limit):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        url = f"/api/inquiries/?limit={limit}"
+        first = await client.get(url)
+        first.raise_for_status()
+
+        started = time.perf_counter()
+        for _ in range(requests):
+            await client.get(url)
+        elapsed = time.perf_counter() - started
+    return requests / elapsed, first.json()
+
+async def run(args, path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    session_factory = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    try:
+        results = {}
+        for name, app in build_apps(session_factory).items():
+            results[name] = await measure(app, args.requests, args.limit)
+
+        assert results["before"][1] == results["after"][1], "both paths must return the same body"
+        for name, (rate, _) in results.items():
+            print(f"{name:>6}: {rate:8.1f} req/s")
+        print(f"speedup: {results['after'][0] / results['before'][0]:.2f}x")
+    finally:
+        await engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000, help="Inquiries in the database")
+    parser.add_argument("--limit", type=int, default=100, help="Rows per page")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per variant")
+    args = parser.parse_args()
+    # The client logs every request at INFO
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    path = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+    engine = create_engine(f"sqlite:///{path}")
+    try:
+        Base.metadata.create_all(bind=engine, tables=[Inquiry.__table__])
+        populate(engine, args.rows)
+        asyncio.run(run(args, path))
+    finally:
+        engine.dispose()
+        os.remove(path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+import time
+from unittest.mock import MagicMock, patch
+from app.db.models import InquiryType
+from app.llm.cache import ClassificationCache
+from app.llm.cascade import CascadeClassifier
+from app.llm.answer_reuse import AnswerReuseIndex
+from app.llm.classifier import InquiryClassifier
+
+RESULT = {
+    "type": InquiryType.BILLING,
+    "confidence": 0.9,
+    "should_escalate": False,
+    "escalation_reason": None
+}
+
+def test_key_ignores_case_and_whitespace():
+    key_a = ClassificationCache.make_key("Reset my  password", "gpt-4", "v1")
+    key_b = ClassificationCache.make_key("  reset MY password\n", "gpt-4", "v1")
+    key_c = ClassificationCache.make_key("reset my password", "gpt-4", "v2")
+    assert key_a == key_b
+    assert key_a != key_c
+
+def test_memory_tier_lru_and_ttl():
+    cache = ClassificationCache(max_size=2, ttl_seconds=60)
+    cache.set("a", RESULT)
+    cache.set("b", RESULT)
+    cache.get("a")
+    cache.set("c", RESULT)  # evicts "b", the least recently used entry
+    
+    assert cache.get("a") == RESULT
+    assert cache.get("b") is None
+    
+    cache.ttl_seconds = 0
+    assert cache.get("c") is None
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 2
+
+def test_disk_tier_survives_restart(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    ClassificationCache(db_path=db_path).set("key", RESULT)
+    
+    cache = ClassificationCache(db_path=db_path)
+    assert cache.get("key") == RESULT
+    assert cache.stats()["disk_hits"] == 1
+
+def test_disk_tier_runs_off_loop_and_prunes_expired_rows(tmp_path):
+    import asyncio
+    import sqlite3
+    from app.llm import cache as cache_module
+    
+    db_path = str(tmp_path / "cache.db")
+    cache = ClassificationCache(db_path=db_path)
+    real_to_thread = asyncio.to_thread
+    with patch.object(cache_module.asyncio, "to_thread", side_effect=real_to_thread) as to_thread:
+        asyncio.run(cache.aset("old", RESULT))
+        assert asyncio.run(ClassificationCache(db_path=db_path).aget("old")) == RESULT
+    assert to_thread.call_count == 2
+    
+    def disk_keys():
+        with sqlite3.connect(db_path) as conn:
+            return {key for key, in conn.execute("SELECT key FROM classification_cache")}
+    
+    # Rows past the TTL are deleted at startup and by later writes
+    with patch.object(cache_module.time, "time", return_value=time.time() + 120):
+        ClassificationCache(ttl_seconds=60, db_path=db_path)
+    assert disk_keys() == set()
+    
+    cache = ClassificationCache(ttl_seconds=60, db_path=db_path)
+    cache.set("stale", RESULT)
+    with patch.object(cache_module.time, "time", return_value=time.time() + cache_module.PRUNE_INTERVAL_SECONDS):
+        cache.set("fresh", RESULT)
+    assert disk_keys() == {"fresh"}
+
+def test_classifier_hit_skips_chain():
+    with patch('app.llm.classifier.ChatOpenAI'), patch('app.llm.classifier.LLMChain'):
+        classifier = InquiryClassifier()
+    classifier.chain.run.return_value = "Category: BILLING (confidence 90%)"
+    
+    first = classifier.classify("My order never arrived")
+    second = classifier.classify("my ORDER  never arrived")
+    
+    assert first == second
+    assert classifier.chain.run.call_count == 1
+
+def test_cascade_short_circuits_obvious_inquiries():
+    cascade = CascadeClassifier(min_confidence=0.85)
+    
+    result = cascade.classify("I was charged twice, please refund me")
+    assert result["type"] == InquiryType.BILLING
+    assert result["should_escalate"] is False
+    
+    # Mixed signals and escalation cues are left to the LLM
+    assert cascade.classify("I want a refund but the app crashes") is None
+    assert cascade.classify("URGENT refund now!!") is None
+    assert cascade.stats()["short_circuits"] == 1
+    assert cascade.stats()["passthroughs"] == 2
+
+def test_answer_index_matches_near_duplicates():
+    index = AnswerReuseIndex(threshold=0.6)
+    index.add(1, "How do I reset my password for the mobile app?", "Tap 'Forgot password'.")
+    index.add(2, "Can I change the billing date of my subscription?", "Yes, under Settings.")
+    
+    match = index.lookup("how do I reset my password for the mobile app")
+    assert match.inquiry_id == 1
+    assert match.answer == "Tap 'Forgot password'."
+    
+    # An inquiry never matches itself, and unrelated text doesn't match at all
+    assert index.lookup("How do I reset my password for the mobile app?", exclude_id=1) is None
+    assert index.lookup("Do you have an office in Berlin?") is None
+    
+    index.remove(1)
+    assert index.lookup("How do I reset my password for the mobile app?") is None
+    assert index.stats()["hits"] == 1
+
+def test_answer_index_reuses_only_agent_replies_without_personal_details():
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.db.models import Base, Inquiry, InquiryStatus, Response, User
+    
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    jane = User(email="jane.doe@example.com", name="Jane Doe", hashed_password="x")
+    agent = User(email="agent@example.com", name="Agent", hashed_password="x")
+    db.add_all([jane, agent])
+    db.commit()
+    answered = Inquiry(customer_id=jane.id, subject="Password", content="How do I reset my password for the app?",
+                       status=InquiryStatus.RESOLVED)
+    unreviewed = Inquiry(customer_id=jane.id, subject="Billing", content="Can I change the billing date please?",
+                         status=InquiryStatus.RESOLVED)
+    db.add_all([answered, unreviewed])
+    db.commit()
+    db.add_all([
+        Response(inquiry_id=answered.id, agent_id=agent.id, is_automated=False,
+                 content="Hi Jane, tap 'Forgot password' and we'll email jane.doe@example.com. Thanks, Jane Doe!"),
+        # A scheduler follow-up after the agent's reply, and LLM output nobody approved
+        Response(inquiry_id=answered.id, content="Just checking in, Jane."),
+        Response(inquiry_id=unreviewed.id, content="Yes, under Settings.")
+    ])
+    db.commit()
+    
+    index = AnswerReuseIndex(threshold=0.6)
+    assert index.load(db) == 1
+    assert index.lookup("Can I change the billing date please?") is None
+    
+    match = index.lookup("how do I reset my password for the app")
+    bob = User(email="bob@example.com", name="Bob Smith")
+    assert match.for_customer(bob).answer == (
+        "Hi Bob Smith, tap 'Forgot password' and we'll email bob@example.com. Thanks, Bob Smith!"
+    )
+    assert "Jane" not in match.for_customer(None).answer
+    
+    # Indexing a single inquiry as it is resolved applies the same rules
+    index = AnswerReuseIndex(threshold=0.6)
+    index.add_resolved(db, unreviewed)
+    index.add_resolved(db, answered)
+    assert len(index) == 1
+    assert "jane" not in index.lookup(answered.content).answer.lower()
+    db.close()
+    engine.dispose()
+
+def test_answer_index_rebuild_follows_other_workers_changes():
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.db.models import Base, Inquiry, InquiryStatus, Response, User
+    
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    agent = User(email="agent@example.com", name="Agent", hashed_password="x")
+    first = Inquiry(subject="Password", content="How do I reset my password for the app?",
+                    status=InquiryStatus.RESOLVED)
+    second = Inquiry(subject="Billing", content="Can I change the billing date of my plan?",
+                     status=InquiryStatus.IN_PROGRESS)
+    db.add_all([agent, first, second])
+    db.commit()
+    db.add_all([Response(inquiry_id=inquiry.id, agent_id=agent.id, content="Done.") for inquiry in (first, second)])
+    db.commit()
+    
+    index = AnswerReuseIndex(threshold=0.6)
+    assert index.rebuild(db) == 1
+    
+    # Another worker reopens the first inquiry and resolves the second
+    first.status = InquiryStatus.IN_PROGRESS
+    second.status = InquiryStatus.CLOSED
+    db.commit()
+    assert index.rebuild(db) == 1
+    assert index.lookup(first.content) is None
+    assert index.lookup(second.content).inquiry_id == second.id
+    db.close()
+    engine.dispose()
+
+def test_current_user_is_served_from_auth_cache():
+    import asyncio
+    from unittest.mock import AsyncMock
+    from app.core import security
+    from app.core.auth_cache import AuthCache
+    from app.db.models import User
+    
+    cache = AuthCache(max_size=8, ttl_seconds=60)
+    user = User(id=7, email="agent@example.com", name="Agent", is_admin=True)
+    db = MagicMock()
+    db.get = AsyncMock(return_value=user)
+    token = security.create_access_token({"sub": "7"})
+    
+    with patch.object(security, "auth_cache", cache):
+        first = asyncio.run(security.get_current_user(token, db))
+        second = asyncio.run(security.get_current_user(token, db))
+        assert db.get.await_count == 1
+        assert second is first
+        assert (first.id, first.email, first.is_admin) == (7, "agent@example.com", True)
+        
+        # Modifying the user drops the snapshot
+        security.invalidate_cached_user(None, None, user)
+        asyncio.run(security.get_current_user(token, db))
+        assert db.get.await_count == 2
+    
+    # A snapshot loaded before an invalidation isn't cached
+    generation = cache.generation()
+    cache.invalidate_user(7)
+    cache.set_user(first, generation)
+    assert cache.get_user(7) is None
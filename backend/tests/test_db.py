@@ -0,0 +1,132 @@
+from sqlalchemy import create_engine, inspect, text
+from app.db.migrations import run_migrations
+from app.db.models import Base
+
+def test_migrations_add_columns_to_existing_tables():
+    # A table created before the summary columns existed gets them added
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE inquiries (id INTEGER PRIMARY KEY, content TEXT)"))
+    
+    run_migrations(engine)
+    run_migrations(engine)  # Re-running is a no-op
+    
+    columns = {col["name"] for col in inspect(engine).get_columns("inquiries")}
+    assert {"conversation_summary", "summarized_through_id"} <= columns
+
+def test_migrations_on_fresh_schema():
+    # create_all already has the latest columns, so migrations just record versions
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar() >= 1
+
+def test_migrations_add_indexes_to_existing_tables():
+    # Tables created before the indexes were declared get them added
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE inquiries (id INTEGER PRIMARY KEY, content TEXT)"))
+        conn.execute(text(
+            "CREATE TABLE responses (id INTEGER PRIMARY KEY, inquiry_id INTEGER, created_at DATETIME)"
+        ))
+    
+    run_migrations(engine)
+    
+    indexes = {index["name"] for index in inspect(engine).get_indexes("responses")}
+    assert "ix_responses_inquiry_created" in indexes
+    
+    with engine.connect() as conn:
+        plan = conn.execute(text(
+            "EXPLAIN QUERY PLAN SELECT * FROM responses WHERE inquiry_id = 1 ORDER BY created_at"
+        )).fetchall()
+    assert "ix_responses_inquiry_created" in " ".join(str(row[-1]) for row in plan)
+
+def test_keyset_pagination_visits_every_row_once():
+    import pytest
+    from datetime import datetime
+    from fastapi import HTTPException
+    from sqlalchemy.orm import sessionmaker
+    from app.api.pagination import paginate, decode_cursor
+    from app.db.models import Inquiry
+    
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    # Ties on created_at are broken by id
+    same_time = datetime(2024, 1, 1, 12, 0, 0)
+    db.add_all([Inquiry(subject=f"Inquiry {i}", content="Help", created_at=same_time) for i in range(3)])
+    db.add_all([Inquiry(subject=f"Later {i}", content="Help", created_at=datetime(2024, 1, 2)) for i in range(2)])
+    db.commit()
+    
+    seen = []
+    cursor = None
+    while True:
+        page, cursor = paginate(db.query(Inquiry), Inquiry.created_at, Inquiry.id, 2, cursor=cursor, descending=True)
+        seen.extend(inquiry.id for inquiry in page)
+        if cursor is None:
+            break
+    assert seen == [5, 4, 3, 2, 1]
+    
+    # Offset pagination still works without a cursor
+    page, _ = paginate(db.query(Inquiry), Inquiry.created_at, Inquiry.id, 2, skip=3, descending=True)
+    assert [inquiry.id for inquiry in page] == [2, 1]
+    
+    with pytest.raises(HTTPException):
+        decode_cursor("not-a-cursor")
+    db.close()
+
+def test_keyset_pagination_over_default_timestamps():
+    from sqlalchemy.orm import sessionmaker
+    from app.api.pagination import paginate
+    from app.db.models import Inquiry
+    
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    # Rows from before timestamps were set by the application: CURRENT_TIMESTAMP, no microseconds
+    with engine.begin() as conn:
+        for i in range(3):
+            conn.execute(text(
+                "INSERT INTO inquiries (subject, content, created_at) VALUES (:subject, 'Help', CURRENT_TIMESTAMP)"
+            ), {"subject": f"Legacy {i}"})
+    run_migrations(engine)
+    
+    db = sessionmaker(bind=engine)()
+    db.add_all([Inquiry(subject=f"Inquiry {i}", content="Help") for i in range(3)])
+    db.commit()
+    
+    for descending, expected in ((True, [6, 5, 4, 3, 2, 1]), (False, [1, 2, 3, 4, 5, 6])):
+        seen = []
+        cursor = None
+        for _ in range(len(expected)):
+            page, cursor = paginate(db.query(Inquiry), Inquiry.created_at, Inquiry.id, 2,
+                                    cursor=cursor, descending=descending)
+            seen.extend(inquiry.id for inquiry in page)
+            if cursor is None:
+                break
+        assert seen == expected
+    db.close()
+
+def test_pool_metrics_and_sqlite_profile(tmp_path):
+    from sqlalchemy.pool import QueuePool
+    from app.db.pool import PoolMetrics, timed_pool
+    from app.db.session import apply_sqlite_performance_profile
+    
+    metrics = PoolMetrics()
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=timed_pool(QueuePool, metrics), pool_size=2)
+    metrics.attach(engine)
+    apply_sqlite_performance_profile(engine)
+    
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert metrics.stats(engine.pool)["checked_out"] == 1
+    with engine.connect() as conn:
+        pass
+    
+    stats = metrics.stats(engine.pool)
+    assert stats["connects"] == 1
+    assert stats["checkouts"] == 2 and stats["checkins"] == 2
+    assert stats["checked_out"] == 0
+    engine.dispose()
@@ -0,0 +1,291 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.api.routes import inquiries, responses, users
+from app.db.models import Base
+from app.db.session import get_async_db
+
+@pytest.fixture
+def api(tmp_path):
+    # The routers mounted like main.py does, on a throwaway file database
+    path = tmp_path / "api.db"
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    async_session_factory = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.include_router(inquiries.router, prefix="/api/inquiries")
+    app.include_router(responses.router, prefix="/api/responses")
+    app.include_router(users.router, prefix="/api/users")
+
+    async def override_get_async_db():
+        async with async_session_factory() as db:
+            yield db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+
+    # Background work opens its own sessions
+    with patch.object(responses, "AsyncSessionLocal", async_session_factory), \
+            patch.object(inquiries, "AsyncSessionLocal", async_session_factory):
+        yield SimpleNamespace(
+            app=app,
+            client=TestClient(app),
+            session_factory=sessionmaker(autocommit=False, autoflush=False, bind=engine),
+            async_session_factory=async_session_factory
+        )
+    asyncio.run(async_engine.dispose())
+    engine.dispose()
+
+def test_list_users_encodes_rows_like_the_response_model(api):
+    from datetime import datetime
+    from app.db.models import User
+
+    db = api.session_factory()
+    db.add_all([
+        User(email=f"user{i}@example.com", name=f"User {i}", hashed_password="x", is_admin=i == 0,
+             created_at=datetime(2024, 1, 1, 12, 0, i, 250000))
+        for i in range(3)
+    ])
+    db.commit()
+    expected = [users.UserResponse.model_validate(user).model_dump(mode="json")
+                for user in db.query(User).order_by(User.created_at, User.id)]
+    db.close()
+
+    first = api.client.get("/api/users/", params={"limit": 2})
+    assert first.status_code == 200
+    second = api.client.get("/api/users/", params={"limit": 2, "cursor": first.headers["X-Next-Cursor"]})
+    assert "X-Next-Cursor" not in second.headers
+    assert first.json() + second.json() == expected
+
+def test_export_streams_filtered_inquiries_with_responses(api, monkeypatch):
+    import csv
+    import io
+    import orjson
+    from datetime import datetime
+    from app.api import export
+    from app.core.auth_cache import UserSnapshot
+    from app.core.security import get_current_admin
+    from app.db.models import Inquiry, InquiryStatus, Response
+
+    # Small batches so the export spans several cursor partitions
+    monkeypatch.setattr(export, "EXPORT_BATCH_SIZE", 2)
+    api.app.dependency_overrides[get_current_admin] = lambda: UserSnapshot(1, "a@example.com", "Admin", True)
+
+    db = api.session_factory()
+    db.add_all([
+        Inquiry(subject=f"Inquiry {i}", content="Help", escalated=i % 2 == 0,
+                status=InquiryStatus.NEW, created_at=datetime(2024, 1, 1 + i))
+        for i in range(5)
+    ])
+    db.commit()
+    db.add_all([Response(inquiry_id=1, content=f"Reply {i}", created_at=datetime(2024, 2, 1, i)) for i in range(2)])
+    db.commit()
+    db.close()
+
+    ndjson = api.client.get("/api/inquiries/export", params={"escalated": True, "include_responses": True})
+    assert ndjson.status_code == 200
+    assert ndjson.headers["content-type"] == "application/x-ndjson"
+    records = [orjson.loads(line) for line in ndjson.content.splitlines()]
+    assert [record["id"] for record in records] == [1, 3, 5]
+    assert [response["content"] for response in records[0]["responses"]] == ["Reply 0", "Reply 1"]
+    assert records[1]["responses"] == []
+
+    exported = api.client.get("/api/inquiries/export", params={
+        "format": "csv", "include_responses": True, "created_after": "2024-01-02T00:00:00"
+    })
+    rows = list(csv.DictReader(io.StringIO(exported.text)))
+    assert [row["id"] for row in rows] == ["2", "3", "4", "5"]
+    assert rows[0]["status"] == "new" and rows[0]["response_id"] == ""
+
+    assert api.client.get("/api/inquiries/export", params={"status": "bogus"}).status_code == 400
+
+def test_deferred_inquiry_is_accepted_and_its_classification_pushed(api):
+    import httpx
+    from app.core.security import create_access_token
+    from app.db.models import InquiryType, User
+    from app.tasks import classification
+    from app.websocket import server
+    from app.websocket.events import OrjsonCodec
+    
+    db = api.session_factory()
+    customer = User(email="customer@example.com", name="Customer", hashed_password="x")
+    agent = User(email="agent@example.com", name="Agent", hashed_password="x", is_admin=True)
+    db.add_all([customer, agent])
+    db.commit()
+    customer_id, agent_id = customer.id, agent.id
+    db.close()
+    
+    classifier = MagicMock()
+    classifier.aclassify = AsyncMock(return_value={
+        "type": InquiryType.BILLING, "confidence": 0.9, "should_escalate": False, "escalation_reason": None
+    })
+    pool = classification.ClassificationWorkerPool(classifier, workers=1)
+    
+    async def scenario():
+        # An agent dashboard socket, registered the way engine.io connects one
+        sid = await server.sio.manager.connect("eio-agent", "/")
+        assert await server.connect(sid, {}, {"token": create_access_token({"sub": str(agent_id)})})
+        await server.join(sid, {"room": "agents"})
+        await pool.start()
+        try:
+            transport = httpx.ASGITransport(app=api.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                created = await client.post("/api/inquiries/", params={"defer": True}, json={
+                    "subject": "Refund", "content": "I was charged twice", "customer_id": customer_id
+                })
+            await asyncio.wait_for(pool.queue.join(), timeout=5)
+        finally:
+            await pool.stop()
+            await server.disconnect(sid)
+            await server.sio.manager.disconnect(sid, "/")
+        return created
+    
+    with patch.object(classification, "AsyncSessionLocal", api.async_session_factory), \
+            patch.object(server, "AsyncSessionLocal", api.async_session_factory), \
+            patch.object(inquiries, "classification_pool", pool), \
+            patch.object(server.sio, "_send_eio_packet", AsyncMock()) as send:
+        created = asyncio.run(scenario())
+    
+    assert created.status_code == 202
+    assert created.json()["status"] == "pending_classification"
+    
+    # Decode what was written to the agent's engine.io connection
+    events = [OrjsonCodec.loads(call.args[1].data[1:]) for call in send.await_args_list
+              if call.args[0] == "eio-agent"]
+    pushed = [payload for event, payload in events if event == "new_inquiry"]
+    assert len(pushed) == 1
+    assert pushed[0]["id"] == created.json()["id"]
+    assert (pushed[0]["status"], pushed[0]["inquiry_type"]) == ("new", "billing")
+
+def test_password_hashing_runs_off_loop_and_detects_cost_changes():
+    with patch.object(users.settings, "BCRYPT_ROUNDS", 4):
+        hashed = asyncio.run(users.ahash_password("secret"))
+        assert hashed.startswith("$2b$04$")
+        assert asyncio.run(users.averify_password("secret", hashed))
+        assert not asyncio.run(users.averify_password("wrong", hashed))
+        assert not users.needs_rehash(hashed)
+    
+    # Raising the cost marks existing hashes for an upgrade on next login
+    with patch.object(users.settings, "BCRYPT_ROUNDS", 5):
+        assert users.needs_rehash(hashed)
+
+def test_login_upgrades_hashes_below_the_configured_cost(api):
+    from app.db.models import User
+    
+    with patch.object(users.settings, "BCRYPT_ROUNDS", 4):
+        created = api.client.post("/api/users/", json={
+            "email": "agent@example.com", "name": "Agent", "password": "secret"
+        })
+    assert created.status_code == 201
+    
+    with patch.object(users.settings, "BCRYPT_ROUNDS", 5):
+        assert api.client.post("/api/users/login", data={
+            "username": "agent@example.com", "password": "wrong"
+        }).status_code == 401
+        login = api.client.post("/api/users/login", data={"username": "agent@example.com", "password": "secret"})
+    assert login.status_code == 200 and login.json()["access_token"]
+    
+    db = api.session_factory()
+    assert db.query(User).one().hashed_password.startswith("$2b$05$")
+    db.close()
+
+def test_generated_response_streams_tokens_then_saves_it(api):
+    import json
+    from app.db.models import Inquiry, InquiryStatus, Response
+    
+    db = api.session_factory()
+    inquiry = Inquiry(subject="Password", content="How do I reset my password?", status=InquiryStatus.NEW)
+    db.add(inquiry)
+    db.commit()
+    inquiry_id = inquiry.id
+    db.close()
+    
+    async def fake_stream(inquiry, previous_responses):
+        for token in ["Tap ", "'Forgot ", "password'."]:
+            yield token
+    
+    with patch.object(responses.response_generator, "astream_response", fake_stream), \
+            patch.object(responses.history_builder, "aprepare", AsyncMock(return_value=[])), \
+            patch.object(responses.settings, "ANSWER_REUSE_ENABLED", False), \
+            patch.object(responses, "notify_new_response"), \
+            patch.object(responses, "emit_response_chunk", AsyncMock()) as emit_chunk, \
+            patch.object(responses, "emit_new_response", AsyncMock()) as emit_response:
+        streamed = api.client.post(f"/api/responses/generate/{inquiry_id}/stream")
+    
+    assert streamed.status_code == 200
+    assert streamed.headers["content-type"].startswith("text/event-stream")
+    events = [
+        (message.split("\n")[0].removeprefix("event: "), json.loads(message.split("\n")[1].removeprefix("data: ")))
+        for message in streamed.text.split("\n\n") if message
+    ]
+    assert [event for event, _ in events] == ["token", "token", "token", "done"]
+    assert [data for event, data in events if event == "token"] == ["Tap ", "'Forgot ", "password'."]
+    assert [call.args[2] for call in emit_chunk.await_args_list] == [0, 1, 2]
+    
+    done = events[-1][1]
+    assert done["content"] == "Tap 'Forgot password'."
+    emit_response.assert_awaited_once()
+    
+    db = api.session_factory()
+    saved = db.get(Response, done["id"])
+    assert (saved.inquiry_id, saved.content, saved.is_automated) == (inquiry_id, done["content"], True)
+    assert db.get(Inquiry, inquiry_id).status == InquiryStatus.IN_PROGRESS
+    db.close()
+
+def test_llm_calls_run_without_holding_a_database_transaction(api):
+    from app.db.models import Inquiry, InquiryStatus, InquiryType, User
+    
+    sessions = []
+    
+    async def recording_get_async_db():
+        async with api.async_session_factory() as db:
+            sessions.append(db)
+            yield db
+    api.app.dependency_overrides[get_async_db] = recording_get_async_db
+    
+    db = api.session_factory()
+    customer = User(email="customer@example.com", name="Customer", hashed_password="x")
+    db.add(customer)
+    db.commit()
+    customer_id = customer.id
+    inquiry = Inquiry(subject="Password", content="How do I reset my password?", status=InquiryStatus.NEW)
+    db.add(inquiry)
+    db.commit()
+    inquiry_id = inquiry.id
+    db.close()
+    
+    in_transaction = []
+    
+    async def fake_generate(inquiry, previous_responses):
+        in_transaction.append(sessions[-1].in_transaction())
+        return "Tap 'Forgot password'."
+    
+    async def fake_classify(text):
+        in_transaction.append(sessions[-1].in_transaction())
+        return {"type": InquiryType.TECHNICAL, "confidence": 0.9, "should_escalate": False,
+                "escalation_reason": None}
+    
+    with patch.object(responses.response_generator, "agenerate_response", fake_generate), \
+            patch.object(responses.settings, "ANSWER_REUSE_ENABLED", False), \
+            patch.object(responses, "notify_new_response"), \
+            patch.object(responses, "emit_new_response", AsyncMock()), \
+            patch.object(inquiries.classification_batcher, "aclassify", fake_classify), \
+            patch.object(inquiries, "emit_new_inquiry", AsyncMock()):
+        generated = api.client.post(f"/api/responses/generate/{inquiry_id}")
+        created = api.client.post("/api/inquiries/", params={"defer": False}, json={
+            "subject": "Login", "content": "The app crashes when I log in", "customer_id": customer_id
+        })
+    
+    assert generated.status_code == 200 and generated.json()["content"] == "Tap 'Forgot password'."
+    assert created.status_code == 201 and created.json()["inquiry_type"] == "technical"
+    assert in_transaction == [False, False]
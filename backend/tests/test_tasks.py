@@ -0,0 +1,297 @@
+import asyncio
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from app.db.models import Base, Inquiry, InquiryStatus, InquiryType
+from app.db.session import SQLITE_SAVEPOINTS, enable_sqlite_savepoints
+
+@pytest.fixture
+def database_path(tmp_path):
+    # File database so the sync test sessions and the async task sessions share it
+    return tmp_path / "tasks.db"
+
+@pytest.fixture
+def session_factory(database_path):
+    engine = create_engine(f"sqlite:///{database_path}")
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+@pytest.fixture
+def async_engine(database_path, session_factory):
+    # Each test runs its own event loop, so connections aren't pooled across them
+    engine = create_async_engine(f"sqlite+aiosqlite:///{database_path}", poolclass=NullPool)
+    enable_sqlite_savepoints(engine.sync_engine)
+    yield engine
+    asyncio.run(engine.dispose())
+
+@pytest.fixture
+def async_session_factory(async_engine):
+    return async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+@pytest.fixture
+def savepoint_session_factory(async_engine):
+    return async_sessionmaker(
+        async_engine.execution_options(**{SQLITE_SAVEPOINTS: True}), autoflush=False, expire_on_commit=False
+    )
+
+def test_deferred_classification_updates_inquiry(session_factory, async_session_factory):
+    from app.tasks import classification
+    
+    db = session_factory()
+    inquiry = Inquiry(
+        subject="Refund",
+        content="I was charged twice",
+        status=InquiryStatus.PENDING_CLASSIFICATION
+    )
+    db.add(inquiry)
+    db.commit()
+    inquiry_id = inquiry.id
+    db.close()
+    
+    classifier = MagicMock()
+    classifier.aclassify = AsyncMock(return_value={
+        "type": InquiryType.BILLING,
+        "confidence": 0.95,
+        "should_escalate": False,
+        "escalation_reason": None
+    })
+    pool = classification.ClassificationWorkerPool(classifier, workers=1)
+    
+    with patch.object(classification, "AsyncSessionLocal", async_session_factory), \
+            patch.object(classification, "emit_new_inquiry", AsyncMock()) as emit_new, \
+            patch.object(classification, "emit_escalation", AsyncMock()) as emit_escalation:
+        asyncio.run(pool._classify(inquiry_id))
+    
+    db = session_factory()
+    inquiry = db.query(Inquiry).filter(Inquiry.id == inquiry_id).first()
+    assert inquiry.status == InquiryStatus.NEW
+    assert inquiry.inquiry_type == InquiryType.BILLING
+    assert inquiry.confidence_score == 0.95
+    emit_new.assert_awaited_once()
+    emit_escalation.assert_not_awaited()
+    db.close()
+
+def test_find_followup_candidates_uses_latest_response(session_factory, async_session_factory):
+    from datetime import timedelta
+    from app.db.models import naive_utcnow
+    from app.db.models import Response, FollowUp
+    from app.tasks.scheduler import find_followup_candidates
+    
+    now = naive_utcnow()
+    old = now - timedelta(days=10)
+    db = session_factory()
+    stale = Inquiry(subject="Stale", content="Help", status=InquiryStatus.IN_PROGRESS)
+    fresh = Inquiry(subject="Fresh", content="Help", status=InquiryStatus.IN_PROGRESS)
+    resolved = Inquiry(subject="Done", content="Help", status=InquiryStatus.RESOLVED)
+    pending = Inquiry(subject="Pending", content="Help", status=InquiryStatus.AWAITING_CUSTOMER)
+    db.add_all([stale, fresh, resolved, pending])
+    db.commit()
+    
+    db.add_all([
+        Response(inquiry_id=stale.id, content="a", created_at=old),
+        Response(inquiry_id=fresh.id, content="a", created_at=old),
+        Response(inquiry_id=fresh.id, content="b", created_at=now),
+        Response(inquiry_id=resolved.id, content="a", created_at=old),
+        Response(inquiry_id=pending.id, content="a", created_at=old),
+        FollowUp(inquiry_id=pending.id, content="Still there?", scheduled_at=now)
+    ])
+    db.commit()
+    
+    stale_id = stale.id
+    db.close()
+    
+    async def find():
+        async with async_session_factory() as async_db:
+            return await find_followup_candidates(async_db, now=now)
+    
+    candidates = asyncio.run(find())
+    assert [(inquiry.id, last) for inquiry, last in candidates] == [(stale_id, old)]
+
+def test_schedule_followups_runs_concurrently(session_factory, async_session_factory):
+    from datetime import timedelta
+    from app.db.models import naive_utcnow
+    from app.db.models import Response, FollowUp
+    from app.tasks import scheduler
+    
+    old = naive_utcnow() - timedelta(days=10)
+    db = session_factory()
+    inquiries = [Inquiry(subject=f"Inquiry {i}", content="Help", status=InquiryStatus.IN_PROGRESS) for i in range(6)]
+    db.add_all(inquiries)
+    db.commit()
+    db.add_all([Response(inquiry_id=inquiry.id, content="reply", created_at=old) for inquiry in inquiries])
+    db.commit()
+    db.close()
+    
+    in_flight = 0
+    peak = 0
+    
+    async def fake_generate(inquiry, responses):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return {"inquiry_id": inquiry.id, "content": "Checking in", "scheduled_at": naive_utcnow()}
+    
+    with patch.object(scheduler, "AsyncSessionLocal", async_session_factory), \
+            patch.object(scheduler.followup_generator, "agenerate_followup", fake_generate), \
+            patch.object(scheduler.settings, "FOLLOWUP_CONCURRENCY", 3), \
+            patch.object(scheduler.settings, "FOLLOWUP_COMMIT_BATCH_SIZE", 4):
+        asyncio.run(scheduler.schedule_followups())
+    
+    assert peak == 3
+    db = session_factory()
+    assert db.query(FollowUp).count() == 6
+    db.close()
+
+def test_send_followups_isolates_failed_rows(session_factory, savepoint_session_factory):
+    from datetime import timedelta
+    from app.db.models import naive_utcnow
+    from app.db.models import Response, FollowUp
+    from app.tasks import scheduler
+    
+    due = naive_utcnow() - timedelta(minutes=5)
+    db = session_factory()
+    inquiries = [Inquiry(subject=f"Inquiry {i}", content="Help", status=InquiryStatus.IN_PROGRESS,
+                         customer_id=7) for i in range(3)]
+    db.add_all(inquiries)
+    db.commit()
+    db.add_all([
+        FollowUp(inquiry_id=inquiries[0].id, content="Checking in", scheduled_at=due),
+        FollowUp(inquiry_id=inquiries[1].id, content=None, scheduled_at=due),
+        FollowUp(inquiry_id=inquiries[2].id, content="Checking in", scheduled_at=due + timedelta(days=1))
+    ])
+    db.commit()
+    db.close()
+    
+    # A follow-up whose response fails to insert must fail on its own
+    from sqlalchemy import event
+    
+    def reject_empty(mapper, connection, target):
+        if target.content is None:
+            raise ValueError("empty follow-up")
+    event.listen(Response, "before_insert", reject_empty)
+    
+    try:
+        with patch.object(scheduler, "SavepointSessionLocal", savepoint_session_factory), \
+                patch.object(scheduler, "emit_new_response", AsyncMock()) as emit:
+            asyncio.run(scheduler.send_followups())
+    finally:
+        event.remove(Response, "before_insert", reject_empty)
+    
+    db = session_factory()
+    followups = db.query(FollowUp).order_by(FollowUp.id).all()
+    assert [(f.successful, f.sent_at is not None) for f in followups] == [
+        (True, True), (False, False), (None, False)
+    ]
+    assert db.query(Response).count() == 1
+    # Follow-up replies use the same UTC clock as sent_at
+    assert abs(db.query(Response).one().created_at - followups[0].sent_at) < timedelta(minutes=1)
+    statuses = [inquiry.status for inquiry in db.query(Inquiry).order_by(Inquiry.id)]
+    assert statuses == [InquiryStatus.AWAITING_CUSTOMER, InquiryStatus.IN_PROGRESS, InquiryStatus.IN_PROGRESS]
+    emit.assert_awaited_once()
+    assert emit.await_args.args[2] == 7
+    db.close()
+
+def test_deadline_queue_orders_and_replaces_deadlines():
+    from datetime import datetime, timedelta
+    from app.tasks.scheduler import DeadlineQueue
+    
+    now = datetime.now()
+    queue = DeadlineQueue()
+    queue.push(now + timedelta(hours=2), DeadlineQueue.SEND, 1)
+    queue.push(now - timedelta(minutes=1), DeadlineQueue.CHECK, 7)
+    assert queue.next_deadline() == now - timedelta(minutes=1)
+    
+    # A newer response pushes the inquiry's check further out
+    queue.push(now + timedelta(days=3), DeadlineQueue.CHECK, 7)
+    assert queue.pop_due(now) == set()
+    assert queue.next_deadline() == now + timedelta(hours=2)
+    
+    assert queue.pop_due(now + timedelta(hours=3)) == {DeadlineQueue.SEND}
+    assert len(queue) == 1
+
+def test_leader_lease_allows_one_holder(async_session_factory):
+    from datetime import timedelta
+    from sqlalchemy import update
+    from app.db.models import SchedulerLease, naive_utcnow
+    from app.tasks.lease import LeaderLease
+    
+    first = LeaderLease("test-scheduler", ttl_seconds=60, holder="worker-1")
+    second = LeaderLease("test-scheduler", ttl_seconds=60, holder="worker-2")
+    
+    async def scenario():
+        async with async_session_factory() as db:
+            assert await first.acquire(db)
+            assert not await second.acquire(db)
+            # Renewing our own lease keeps it
+            assert await first.acquire(db)
+            
+            # Released leases are taken over immediately
+            await first.release(db)
+            assert await second.acquire(db)
+            assert not await first.acquire(db)
+            
+            # Expired leases are taken over too
+            await db.execute(update(SchedulerLease).values(expires_at=naive_utcnow() - timedelta(seconds=1)))
+            await db.commit()
+            assert await first.acquire(db)
+            assert first.is_leader
+    
+    asyncio.run(scenario())
+
+def test_reads_do_not_block_writers_outside_savepoint_sessions(async_engine, async_session_factory,
+                                                               savepoint_session_factory):
+    from app.db.models import User
+    
+    async def run():
+        async with async_session_factory() as reader, async_session_factory() as writer:
+            # An open read transaction must not hold SQLite's lock
+            await reader.execute(select(Inquiry))
+            writer.add(User(email="agent@example.com", name="Agent", hashed_password="x"))
+            await asyncio.wait_for(writer.commit(), timeout=1)
+        
+        async with savepoint_session_factory() as db:
+            db.add(Inquiry(subject="Kept", content="Help"))
+            try:
+                async with db.begin_nested():
+                    db.add(Inquiry(subject="Dropped", content="Help"))
+                    await db.flush()
+                    raise ValueError("roll back the savepoint only")
+            except ValueError:
+                pass
+            await db.commit()
+        
+        async with async_session_factory() as db:
+            return (await db.execute(select(Inquiry.subject))).scalars().all()
+    
+    assert asyncio.run(run()) == ["Kept"]
+
+def test_lease_is_renewed_while_work_runs_and_work_stops_when_lost():
+    from app.tasks import scheduler
+    
+    finished = []
+    
+    async def slow_work():
+        try:
+            await asyncio.sleep(0.2)
+            finished.append(True)
+        except asyncio.CancelledError:
+            finished.append(False)
+            raise
+    
+    # Work outlasting several renewal intervals completes while renewals succeed
+    with patch.object(scheduler, "renew_lease", AsyncMock(return_value=True)) as renew:
+        assert asyncio.run(scheduler.run_while_leader(slow_work(), 0.05)) is True
+    assert finished == [True]
+    assert renew.await_count >= 3
+    
+    # A failed renewal cancels the work
+    with patch.object(scheduler, "renew_lease", AsyncMock(side_effect=[True, False])) as renew:
+        assert asyncio.run(scheduler.run_while_leader(slow_work(), 0.05)) is False
+    assert finished == [True, False]
+    assert renew.await_count == 2
@@ -0,0 +1,128 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+from app.core.security import create_access_token
+from app.websocket import server
+
+def test_connect_joins_user_room_and_offline_customers_are_skipped():
+    async def scenario():
+        token = create_access_token({"sub": "42"})
+        with patch.object(server.sio, "emit", AsyncMock()) as emit, \
+                patch.object(server.sio, "enter_room", AsyncMock()) as enter_room:
+            assert await server.connect("sid-1", {}, {"token": "not-a-token"}) is False
+            assert await server.connect("sid-1", {}, {"token": token}) is True
+            assert await server.connect("sid-2", {}, {"token": token}) is True
+            enter_room.assert_awaited_with("sid-2", "user_42")
+            assert server.user_sids[42] == {"sid-1", "sid-2"}
+            
+            assert server.recipient_rooms(42) == ["agents", "user_42"]
+            assert server.recipient_rooms(43) == ["agents"]
+            
+            await server.disconnect("sid-1")
+            await server.disconnect("sid-2")
+            assert 42 not in server.user_sids
+            assert not server.sid_users
+    
+    asyncio.run(scenario())
+
+def test_only_admins_join_the_agents_room():
+    from app.core.auth_cache import UserSnapshot
+    
+    users = {1: UserSnapshot(1, "admin@example.com", "Admin", True),
+             2: UserSnapshot(2, "customer@example.com", "Customer", False)}
+    
+    async def scenario():
+        with patch.object(server, "load_user", AsyncMock(side_effect=lambda db, user_id: users.get(user_id))), \
+                patch.object(server.sio, "emit", AsyncMock()), \
+                patch.object(server.sio, "enter_room", AsyncMock()) as enter_room:
+            for user_id in users:
+                token = create_access_token({"sub": str(user_id)})
+                assert await server.connect(f"sid-{user_id}", {}, {"token": token})
+                await server.join(f"sid-{user_id}", {"room": "agents"})
+            await server.join("sid-unknown", {"room": "agents"})
+            
+            assert server.connected_clients["agents"] == {"sid-1"}
+            assert ("sid-2", "agents") not in [call.args for call in enter_room.await_args_list]
+            
+            for user_id in users:
+                await server.disconnect(f"sid-{user_id}")
+        assert not server.connected_clients["agents"]
+    
+    asyncio.run(scenario())
+
+def test_unix_socket_manager_delivers_between_workers(tmp_path):
+    import socketio
+    from app.websocket.managers import DeliveryMetrics, UnixSocketManager, with_delivery_metrics
+    
+    async def scenario():
+        metrics = DeliveryMetrics()
+        manager_class = with_delivery_metrics(UnixSocketManager, metrics)
+        workers = [
+            socketio.AsyncServer(async_mode='asgi', client_manager=manager_class(str(tmp_path)))
+            for _ in range(2)
+        ]
+        for worker in workers:
+            worker.manager.initialize()
+        receiver = workers[1].manager
+        try:
+            assert receiver._receiver is not None
+            
+            with patch.object(socketio.AsyncManager, "emit", AsyncMock()) as local_emit:
+                await workers[0].emit("new_response", {"id": 1}, room="user_42")
+                for _ in range(100):
+                    if metrics.delivered:
+                        break
+                    await asyncio.sleep(0.01)
+            
+            # Emitted locally by the publisher and once more by the other worker
+            assert local_emit.await_count == 2
+            assert local_emit.await_args.args[:2] == ("new_response", {"id": 1})
+            assert local_emit.await_args.kwargs["room"] == "user_42"
+            stats = metrics.stats()
+            assert stats["published"] == 1 and stats["delivered"] == 1
+            assert stats["max_latency_ms"] > 0
+        finally:
+            for worker in workers:
+                worker.manager.close()
+        assert not list(tmp_path.iterdir())
+    
+    asyncio.run(scenario())
+
+def test_unix_socket_manager_refuses_shared_directory(tmp_path):
+    import os
+    import pytest
+    from app.websocket.managers import UnixSocketManager
+    
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    os.chmod(shared, 0o777)
+    with pytest.raises(PermissionError):
+        UnixSocketManager(str(shared))
+    
+    with pytest.raises(ValueError):
+        UnixSocketManager(str(tmp_path / ("x" * 100)))
+
+def test_events_are_serialized_once_for_every_room():
+    from datetime import datetime
+    from app.db.models import Inquiry, InquiryStatus, InquiryType, Response
+    from app.websocket.events import EVENT_SCHEMA_VERSION, OrjsonCodec
+    
+    inquiry = Inquiry(id=3, customer_id=42, subject="Refund", content="Please refund me",
+                      inquiry_type=InquiryType.BILLING, status=InquiryStatus.NEW,
+                      confidence_score=0.9, escalated=False, created_at=datetime(2024, 5, 1, 12, 30))
+    response = Response(id=8, inquiry_id=3, content="Done", is_automated=True, created_at=datetime(2024, 5, 1, 13))
+    
+    async def scenario():
+        with patch.object(server.sio, "emit", AsyncMock()) as emit, \
+                patch.object(server, "has_local_sockets_only", return_value=False):
+            await server.emit_inquiry_updated(inquiry)
+            await server.emit_new_response(response, 3, 42)
+        return emit.await_args_list
+    
+    updated, new_response = asyncio.run(scenario())
+    assert updated.kwargs["room"] == ["agents", "user_42"]
+    payload = OrjsonCodec.loads(OrjsonCodec.dumps(updated.args[1]))
+    assert payload["schema_version"] == EVENT_SCHEMA_VERSION
+    assert payload["inquiry_type"] == "billing" and payload["status"] == "new"
+    assert payload["created_at"] == "2024-05-01T12:30:00"
+    assert new_response.args[1]["inquiry_id"] == 3 and new_response.args[1]["content"] == "Done"
@@ -30,6 +30,7 @@ export enum InquiryType {
 }
 
 export enum InquiryStatus {
+  PENDING_CLASSIFICATION = "pending_classification",
   NEW = "new",
   IN_PROGRESS = "in_progress",
   AWAITING_CUSTOMER = "awaiting_customer",